@@ -10,18 +10,24 @@ from hashlib import md5
 import frappe
 from frappe import _
 from frappe.utils import cint  # type: ignore
+from frappe.utils.background_jobs import is_job_enqueued
 
+from apex_item.app_state import get_app_state, set_app_state
 from apex_item.item_price_config import (
 	get_allowed_fieldnames,
 	get_default_card_config,
 	get_field_definition,
 )
-from apex_item.item_price_hooks import set_stock_fields
-from apex_item.item_foreign_purchase import get_item_foreign_purchase_info
+from apex_item.bulk_write import bulk_update_values, get_bulk_write_chunk_size
+from apex_item.item_foreign_purchase import get_foreign_purchase_item_values, get_items_foreign_purchase_info
+from apex_item.item_price_hooks import get_item_price_row_fields, refresh_item_price_rows
 
 _CARD_CONFIG_CACHE_KEY = "apex_item:item_price_card_config"
 _EXCLUDED_CARD_FIELDS = {"item_name"}
 _PRIMARY_PRICE_FIELD = "price_list_rate"
+_ITEM_PRICE_REFRESH_CHUNK_SIZE = 500
+_ITEM_PRICE_RECONCILE_RUN_KEY = "item_price_full_reconcile"
+_DEFAULT_RECONCILE_SHARDS = 4
 
 
 @frappe.whitelist()
@@ -127,71 +133,182 @@ def _make_field_dict(fieldname: str, row: Any = None) -> Optional[Dict[str, Any]
 
 
 @frappe.whitelist()
-def update_all_item_price_qty():
-	"""Update available_qty for all Item Prices"""
-
+def update_all_item_price_qty(
+	shards: int | None = None, resume: bool = False, max_staleness: int | None = None
+) -> dict[str, Any]:
+	"""
+	Start a background reconcile of stock fields for all Item Prices.
+
+	Item Prices are split into shards by a hash of item_code and each shard runs
+	as its own long-queue job, so the run scales with the number of workers.
+	Shards checkpoint after every chunk; with `resume`, unfinished shards of the
+	previous run continue from their checkpoint. Aggregate progress is published
+	on the `progress` realtime event. With `max_staleness` (seconds), rows synced
+	more recently than that are skipped. A new run is refused while shard jobs
+	of the previous one are still queued or running; its run id is returned.
+	"""
 	frappe.only_for("System Manager")
 
-	item_prices = frappe.db.sql(
-		"""
-			SELECT name
-			FROM `tabItem Price`
-			WHERE item_code IS NOT NULL
-		""",
-		as_dict=True,
-	)
-
-	updated = 0
-	item_price_columns = frappe.db.get_table_columns("Item Price")
-	include_item_image = "item_image" in item_price_columns
-
-	for ip in item_prices:
-		try:
-			item_price_doc = frappe.get_doc("Item Price", ip.name)
-			set_stock_fields(item_price_doc)
-
-			values = {
-				"available_qty": item_price_doc.available_qty,
-				"reserved_qty": item_price_doc.reserved_qty,
-				"actual_qty": item_price_doc.actual_qty,
-				"waiting_qty": item_price_doc.waiting_qty,
-				"item_group": item_price_doc.item_group,
-				"stock_warehouse": item_price_doc.stock_warehouse,
+	run = get_app_state(_ITEM_PRICE_RECONCILE_RUN_KEY)
+	if not (cint(resume) and run):
+		active = run and [
+			shard for shard in range(run["shards"]) if is_job_enqueued(_get_reconcile_shard_job_id(run["run_id"], shard))
+		]
+		if active:
+			return {
+				"success": False,
+				"run_id": run["run_id"],
+				"shards": run["shards"],
+				"queued": 0,
+				"active": len(active),
+				"total": run["total"],
+				"message": f"Reconcile run {run['run_id']} still has {len(active)} shard job(s) queued or running.",
 			}
+		if run:
+			# Checkpoints of the previous run are no longer needed
+			for shard in range(run["shards"]):
+				set_app_state(_get_reconcile_shard_key(run["run_id"], shard), None)
+		shards = cint(shards) or cint(frappe.conf.get("apex_item_reconcile_shards")) or _DEFAULT_RECONCILE_SHARDS
+		run = {
+			"run_id": frappe.generate_hash(length=10),
+			"shards": max(shards, 1),
+			"total": frappe.db.count("Item Price", {"item_code": ("is", "set")}),
+			"user": frappe.session.user,
+			"max_staleness": cint(max_staleness) or None,
+		}
+		set_app_state(_ITEM_PRICE_RECONCILE_RUN_KEY, run)
+
+	queued = 0
+	for shard in range(run["shards"]):
+		state = get_app_state(_get_reconcile_shard_key(run["run_id"], shard)) or {}
+		job_id = _get_reconcile_shard_job_id(run["run_id"], shard)
+		if state.get("done") or is_job_enqueued(job_id):
+			continue
 
-			if include_item_image:
-				values["item_image"] = item_price_doc.item_image
+		# Workers must not start before the run record above is committed
+		frappe.enqueue(
+			"apex_item.api.reconcile_item_price_shard",
+			queue="long",
+			timeout=3600,
+			job_id=job_id,
+			deduplicate=True,
+			enqueue_after_commit=True,
+			run_id=run["run_id"],
+			shard=shard,
+			shards=run["shards"],
+			max_staleness=run.get("max_staleness"),
+		)
+		queued += 1
 
-			frappe.db.set_value(
-				"Item Price",
-				ip.name,
-				values,
-				update_modified=False,
-			)
+	return {
+		"success": True,
+		"run_id": run["run_id"],
+		"shards": run["shards"],
+		"queued": queued,
+		"total": run["total"],
+		"message": f"✓ Queued {queued} job(s) to update {run['total']} Item Prices.",
+	}
 
-			updated += 1
 
-			if updated % 50 == 0:
-				frappe.db.commit()
-				frappe.publish_realtime(
-					"progress",
-					{"progress": updated, "total": len(item_prices)},
-					user=frappe.session.user,
-				)
+def reconcile_item_price_shard(run_id: str, shard: int, shards: int, max_staleness: int | None = None) -> None:
+	"""Worker: refresh one shard of Item Price rows in name order, checkpointing each chunk."""
+	shard_key = _get_reconcile_shard_key(run_id, shard)
+	state = get_app_state(shard_key) or {}
+	if state.get("run_id") != run_id:
+		state = {"run_id": run_id, "last_name": "", "processed": 0, "written": 0, "done": 0}
+
+	fields = ", ".join(f"`{fieldname}`" for fieldname in get_item_price_row_fields())
+
+	while True:
+		rows = frappe.db.sql(
+			f"""
+				SELECT {fields}
+				FROM `tabItem Price`
+				WHERE IFNULL(item_code, '') != ''
+					AND CRC32(item_code) %% %(shards)s = %(shard)s
+					AND name > %(last_name)s
+				ORDER BY name ASC
+				LIMIT %(limit)s
+			""",
+			{"shards": shards, "shard": shard, "last_name": state["last_name"], "limit": _ITEM_PRICE_REFRESH_CHUNK_SIZE},
+			as_dict=True,
+		)
+		if not rows:
+			break
 
-		except Exception as exc:
-			frappe.log_error(f"Error updating {ip.name}: {str(exc)}", "Update Item Price Qty")
+		stats = refresh_item_price_rows(rows, max_staleness=max_staleness, source="full_reconcile")
+		state["last_name"] = rows[-1].name
+		state["processed"] += len(rows)
+		state["written"] += stats.written
+		set_app_state(shard_key, state)
+		frappe.db.commit()
+		_publish_item_price_reconcile_progress()
 
+	state["done"] = 1
+	set_app_state(shard_key, state)
 	frappe.db.commit()
+	_publish_item_price_reconcile_progress()
+
+
+@frappe.whitelist()
+def get_item_price_reconcile_status() -> dict[str, Any]:
+	"""Return aggregate progress of the latest full Item Price reconcile."""
+	frappe.only_for("System Manager")
+	return _get_item_price_reconcile_status()
+
+
+def _get_item_price_reconcile_status() -> dict[str, Any]:
+	run = get_app_state(_ITEM_PRICE_RECONCILE_RUN_KEY)
+	if not run:
+		return {}
+
+	processed = written = done = 0
+	for shard in range(run["shards"]):
+		state = get_app_state(_get_reconcile_shard_key(run["run_id"], shard)) or {}
+		if state.get("run_id") != run["run_id"]:
+			continue
+		processed += cint(state.get("processed"))
+		written += cint(state.get("written"))
+		done += cint(state.get("done"))
 
 	return {
-		"success": True,
-		"updated": updated,
-		"total": len(item_prices),
-		"message": f"✓ Updated {updated} Item Prices successfully!",
+		"run_id": run["run_id"],
+		"user": run.get("user"),
+		"total": run["total"],
+		"processed": processed,
+		"written": written,
+		"skipped": processed - written,
+		"shards": run["shards"],
+		"shards_done": done,
+		"finished": done == run["shards"],
 	}
 
 
+def _publish_item_price_reconcile_progress() -> None:
+	status = _get_item_price_reconcile_status()
+	if not status:
+		return
+
+	frappe.publish_realtime(
+		"progress",
+		{
+			"progress": status["processed"],
+			"total": status["total"],
+			"title": _("Updating Item Price stock"),
+			"description": _("{0} of {1} shards finished").format(status["shards_done"], status["shards"]),
+		},
+		user=status.get("user"),
+	)
+
+
+def _get_reconcile_shard_key(run_id: str, shard: int) -> str:
+	return f"{_ITEM_PRICE_RECONCILE_RUN_KEY}:{run_id}:{shard}"
+
+
+def _get_reconcile_shard_job_id(run_id: str, shard: int) -> str:
+	return f"apex_item_item_price_reconcile_{run_id}_{shard}"
+
+
 @frappe.whitelist()
 def update_all_items_foreign_purchase_info():
 	"""
@@ -216,95 +333,38 @@ def update_all_items_foreign_purchase_info():
 	"""
 	frappe.only_for("System Manager")
 	
-	# جلب جميع الأصناف التي لها وثائق شراء
-	items = frappe.db.sql("""
-		SELECT DISTINCT item_code
-		FROM (
-			SELECT DISTINCT poi.item_code
-			FROM `tabPurchase Order Item` poi
-			INNER JOIN `tabPurchase Order` po ON poi.parent = po.name
-			WHERE po.docstatus = 1
-			UNION
-			SELECT DISTINCT pri.item_code
-			FROM `tabPurchase Receipt Item` pri
-			INNER JOIN `tabPurchase Receipt` pr ON pri.parent = pr.name
-			WHERE pr.docstatus = 1
-			UNION
-			SELECT DISTINCT pii.item_code
-			FROM `tabPurchase Invoice Item` pii
-			INNER JOIN `tabPurchase Invoice` pi ON pii.parent = pi.name
-			WHERE pi.docstatus = 1
-		) AS all_items
-		WHERE item_code IS NOT NULL
-		ORDER BY item_code
-	""", as_dict=True)
+	# حساب آخر شراء لجميع الأصناف التي لها وثائق شراء دفعة واحدة
+	payloads = {
+		item_code: get_foreign_purchase_item_values(purchase_info)
+		for item_code, purchase_info in get_items_foreign_purchase_info().items()
+	}
+	item_codes = sorted(payloads)
+	chunk_size = get_bulk_write_chunk_size()
 	
 	updated = 0
 	failed = 0
-	total = len(items)
+	total = len(item_codes)
 	
 	print(f"\n🔄 تحديث {total} صنف...")
 	
-	for idx, item in enumerate(items, 1):
-		item_code = item.item_code
-		
+	for start in range(0, total, chunk_size):
+		chunk = item_codes[start : start + chunk_size]
 		try:
-			purchase_info = get_item_foreign_purchase_info(item_code)
-			
-			if purchase_info:
-				frappe.db.set_value(
-					"Item",
-					item_code,
-					{
-						"item_foreign_purchase_rate": purchase_info.get("rate"),
-						"item_foreign_purchase_currency": purchase_info.get("currency"),
-						"custom_item_foreign_purchase_date": purchase_info.get("purchase_date"),
-						"item_foreign_purchase_voucher_type": purchase_info.get("voucher_type"),
-						"item_foreign_purchase_voucher_no": purchase_info.get("voucher_no"),
-						"item_foreign_purchase_supplier": purchase_info.get("supplier"),
-						"item_foreign_purchase_applicable_charges": purchase_info.get("applicable_charges"),
-						"item_foreign_purchase_lcv": purchase_info.get("lcv_name")
-					},
-					update_modified=False
-				)
-				updated += 1
-			else:
-				# Clear values if no purchase info found
-				frappe.db.set_value(
-					"Item",
-					item_code,
-					{
-						"item_foreign_purchase_rate": 0,
-						"item_foreign_purchase_currency": None,
-						"custom_item_foreign_purchase_date": None,
-						"item_foreign_purchase_voucher_type": None,
-						"item_foreign_purchase_voucher_no": None,
-						"item_foreign_purchase_supplier": None,
-						"item_foreign_purchase_applicable_charges": 0,
-						"item_foreign_purchase_lcv": None
-					},
-					update_modified=False
-				)
-				updated += 1
-			
-			# Commit كل 50 صنف لتجنب timeout
-			if updated % 50 == 0:
-				frappe.db.commit()
-				frappe.publish_realtime(
-					"progress",
-					{"progress": updated, "total": total},
-					user=frappe.session.user,
-				)
-				print(f"  ✓ تم تحديث {updated}/{total} صنف...")
-		
+			updated += bulk_update_values("Item", {item_code: payloads[item_code] for item_code in chunk}, commit=True)
 		except Exception as exc:
-			failed += 1
+			frappe.db.rollback()
+			failed += len(chunk)
 			frappe.log_error(
-				f"Error updating {item_code}: {str(exc)}\n{frappe.get_traceback()}",
+				f"Error updating {len(chunk)} item(s) from {chunk[0]}: {exc!s}\n{frappe.get_traceback()}",
 				"Apex Item - Update All Items Foreign Purchase Info"
 			)
-	
-	frappe.db.commit()
+
+		frappe.publish_realtime(
+			"progress",
+			{"progress": updated, "total": total},
+			user=frappe.session.user,
+		)
+		print(f"  ✓ تم تحديث {updated}/{total} صنف...")
 	
 	return {
 		"success": True,
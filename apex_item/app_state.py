@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+"""Persistent JSON state for Apex Item background jobs (cursors, checkpoints)."""
+
+from __future__ import annotations
+
+import json
+from typing import Any
+
+import frappe
+
+# Stored as DefaultValue rows under a private parent. Writing under "__global"
+# would clear the whole site cache on every checkpoint.
+_STATE_PARENT = "__apex_item"
+
+
+def get_app_state(key: str, default: Any = None) -> Any:
+	# Read the row itself: the cached defaults hash is cleared before commit, so
+	# concurrent jobs could re-cache each other's uncommitted checkpoints
+	raw = frappe.db.get_value("DefaultValue", {"parent": _STATE_PARENT, "defkey": key}, "defvalue")
+	if not raw:
+		return default
+
+	try:
+		return json.loads(raw)
+	except Exception:
+		return default
+
+
+def set_app_state(key: str, value: Any) -> None:
+	filters = {"parent": _STATE_PARENT, "defkey": key}
+	if value is None:
+		frappe.db.delete("DefaultValue", filters)
+		return
+
+	raw = json.dumps(value, default=str)
+	name = frappe.db.get_value("DefaultValue", filters, "name")
+	if name:
+		frappe.db.set_value("DefaultValue", name, "defvalue", raw, update_modified=False)
+		return
+
+	frappe.get_doc(
+		{
+			"doctype": "DefaultValue",
+			"parent": _STATE_PARENT,
+			"parenttype": "__default",
+			"parentfield": "system_defaults",
+			"defkey": key,
+			"defvalue": raw,
+		}
+	).db_insert()
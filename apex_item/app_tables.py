@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+"""Lifecycle helpers for the app-owned tables that are not DocTypes."""
+
+from __future__ import annotations
+
+from collections.abc import Callable
+
+import frappe
+
+
+def ensure_app_table(table: str, create_ddl: str, fill: Callable[[], object], indexes: dict | None = None) -> bool:
+	"""
+	Create `table` with `create_ddl` if missing and fill it with `fill()`.
+	`indexes` ({index name: column list}) are added to an existing table that
+	predates them. Returns True if the table was created.
+	"""
+	if app_table_exists(table, cached=False):
+		for index_name, columns in (indexes or {}).items():
+			if not frappe.db.has_index(table, index_name):
+				frappe.db.sql_ddl(f"ALTER TABLE `{table}` ADD INDEX `{index_name}` ({columns})")
+		return False
+
+	frappe.db.sql_ddl(create_ddl)
+	frappe.cache().delete_value("db_tables")
+	fill()
+	return True
+
+
+def drop_app_table(table: str) -> None:
+	frappe.db.sql_ddl(f"DROP TABLE IF EXISTS `{table}`")
+	frappe.cache().delete_value("db_tables")
+
+
+def app_table_exists(table: str, cached: bool = True) -> bool:
+	return table in (frappe.db.get_tables(cached=cached) or [])
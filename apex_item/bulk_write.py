@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""Chunked multi-row UPDATE helpers used by the bulk refresh paths."""
+
+from __future__ import annotations
+
+import frappe
+from frappe.utils import cint
+
+# Rows per UPDATE statement; override with `apex_item_bulk_write_chunk_size` in site_config.json
+_DEFAULT_CHUNK_SIZE = 500
+
+
+def get_bulk_write_chunk_size() -> int:
+	return cint(frappe.conf.get("apex_item_bulk_write_chunk_size")) or _DEFAULT_CHUNK_SIZE
+
+
+def bulk_update_values(
+	doctype: str,
+	payloads: dict[str, dict],
+	chunk_size: int | None = None,
+	commit: bool = False,
+) -> int:
+	"""
+	Persist {name: {fieldname: value}} maps with one CASE-based UPDATE per chunk.
+
+	Rows may carry different fieldnames; a column keeps its stored value for rows
+	whose payload does not mention it. Fieldnames that are not columns of the
+	table are dropped, and `modified` is left untouched. With `commit`, every
+	chunk is committed on its own so row locks are released early.
+	Returns the number of rows written.
+	"""
+	if not payloads:
+		return 0
+
+	chunk_size = cint(chunk_size) or get_bulk_write_chunk_size()
+	columns = set(frappe.db.get_table_columns(doctype))
+	names = list(payloads)
+	written = 0
+
+	for start in range(0, len(names), chunk_size):
+		chunk = names[start : start + chunk_size]
+		written += _update_chunk(doctype, {name: payloads[name] for name in chunk}, columns)
+		if commit:
+			frappe.db.commit()
+
+	return written
+
+
+def _update_chunk(doctype, payloads, columns):
+	fieldnames = sorted(
+		{fieldname for payload in payloads.values() for fieldname in payload if fieldname in columns}
+	)
+	if not fieldnames:
+		return 0
+
+	assignments = []
+	values = []
+	for fieldname in fieldnames:
+		cases = []
+		for name, payload in payloads.items():
+			if fieldname in payload:
+				cases.append("WHEN %s THEN %s")
+				values.extend((name, payload[fieldname]))
+		assignments.append(
+			"`{fieldname}` = CASE `name` {cases} ELSE `{fieldname}` END".format(
+				fieldname=fieldname, cases=" ".join(cases)
+			)
+		)
+
+	values.extend(payloads)
+	frappe.db.sql(
+		"""
+		UPDATE `tab{doctype}`
+		SET {assignments}
+		WHERE `name` IN ({placeholders})
+	""".format(
+			doctype=doctype,
+			assignments=", ".join(assignments),
+			placeholders=", ".join(["%s"] * len(payloads)),
+		),
+		tuple(values),
+	)
+	return len(payloads)
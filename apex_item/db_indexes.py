@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+"""Index provisioning and query-plan diagnostics for the app's hot queries."""
+
+from __future__ import annotations
+
+from typing import Any
+
+import frappe
+
+from apex_item.item_price_hooks import _RECONCILE_BATCH_SIZE, _get_reconcile_cursor, _get_reconcile_until
+from apex_item.open_purchase_qty import OPEN_PURCHASE_QTY_TABLE
+
+# (doctype, columns, index name) supporting the stock snapshot, reconcile
+# cursor, open Purchase Order and Landed Cost Voucher lookups
+APP_INDEXES = [
+	("Bin", ["item_code", "warehouse"], "apex_item_bin_item_warehouse"),
+	("Bin", ["modified", "name"], "apex_item_bin_modified_name"),
+	("Purchase Order Item", ["item_code", "warehouse"], "apex_item_poi_item_warehouse"),
+	(
+		"Landed Cost Item",
+		["item_code", "receipt_document_type", "receipt_document"],
+		"apex_item_lci_item_receipt",
+	),
+	("Item Price", ["item_code"], "apex_item_item_price_item_code"),
+]
+
+
+def ensure_indexes() -> list[dict[str, Any]]:
+	"""
+	Create the app's composite indexes where no existing index already starts
+	with the same columns. Safe to run repeatedly.
+	Returns one status row per index: exists, covered, created or failed.
+	"""
+	results = []
+	for doctype, columns, index_name in APP_INDEXES:
+		table = f"tab{doctype}"
+		result = {"table": table, "columns": columns, "index": index_name}
+		try:
+			covering_index = _get_covering_index(table, columns)
+			if covering_index == index_name:
+				result["status"] = "exists"
+			elif covering_index:
+				result["status"] = "covered"
+				result["index"] = covering_index
+			else:
+				frappe.db.add_index(doctype, columns, index_name)
+				result["status"] = "created" if frappe.db.has_index(table, index_name) else "failed"
+		except Exception as exc:
+			result["status"] = "failed"
+			result["error"] = str(exc)
+		results.append(result)
+	return results
+
+
+@frappe.whitelist()
+def explain_hot_queries() -> list[dict[str, Any]]:
+	"""
+	Run EXPLAIN on each of the app's hot queries with sample values from this
+	site and flag plan rows that scan a whole table (access type ALL).
+	"""
+	frappe.only_for("System Manager")
+
+	report = []
+	for label, query, params in _get_hot_queries():
+		try:
+			plan = frappe.db.sql(f"EXPLAIN {query}", params, as_dict=True)
+		except Exception as exc:
+			report.append({"query": label, "error": str(exc), "full_scan": None})
+			continue
+
+		for row in plan:
+			report.append(
+				{
+					"query": label,
+					"table": row.get("table"),
+					"type": row.get("type"),
+					"key": row.get("key"),
+					"rows": row.get("rows"),
+					"full_scan": (row.get("type") or "").upper() == "ALL",
+				}
+			)
+	return report
+
+
+def _get_covering_index(table: str, columns: list) -> str | None:
+	"""Return the name of an index whose leading columns are exactly `columns`."""
+	indexes: dict[str, list] = {}
+	for row in frappe.db.sql(f"SHOW INDEX FROM `{table}`", as_dict=True):
+		indexes.setdefault(row.Key_name, []).append((row.Seq_in_index, row.Column_name))
+
+	for index_name, index_columns in indexes.items():
+		leading = [column for _seq, column in sorted(index_columns)][: len(columns)]
+		if leading == columns:
+			return index_name
+	return None
+
+
+def _get_hot_queries() -> list[tuple[str, str, dict]]:
+	"""The queries the app runs on hot paths, with sample values from this site."""
+	item_code = frappe.db.sql("SELECT item_code FROM `tabBin` LIMIT 1")
+	item_code = item_code[0][0] if item_code else "_"
+	warehouse = frappe.db.get_value("Bin", {"item_code": item_code}, "warehouse") or "_"
+	params = {"item_codes": (item_code,), "warehouses": (warehouse,), "item_code": item_code}
+	modified, name = _get_reconcile_cursor()
+
+	return [
+		(
+			"Bin snapshot by item and warehouse",
+			"""
+			SELECT item_code, warehouse, SUM(actual_qty)
+			FROM `tabBin`
+			WHERE item_code IN %(item_codes)s AND warehouse IN %(warehouses)s
+			GROUP BY item_code, warehouse
+			""",
+			params,
+		),
+		(
+			"Bin reconcile cursor",
+			"""
+			SELECT name, item_code, warehouse, modified
+			FROM `tabBin`
+			WHERE modified >= %(modified)s
+				AND (modified > %(modified)s OR name > %(name)s)
+				AND modified < %(until)s
+			ORDER BY modified ASC, name ASC
+			LIMIT %(limit)s
+			""",
+			{"modified": modified, "name": name, "until": _get_reconcile_until(), "limit": _RECONCILE_BATCH_SIZE},
+		),
+		(
+			"Open Purchase Order quantity",
+			f"""
+			SELECT item_code, NULLIF(warehouse, ''), open_qty
+			FROM `{OPEN_PURCHASE_QTY_TABLE}`
+			WHERE item_code IN %(item_codes)s AND warehouse IN %(warehouses)s
+			""",
+			params,
+		),
+		(
+			"Open Purchase Order quantity refresh",
+			"""
+			SELECT POI.item_code, IFNULL(POI.warehouse, ''), SUM(POI.qty - POI.received_qty)
+			FROM `tabPurchase Order Item` POI
+			INNER JOIN `tabPurchase Order` PO ON PO.name = POI.parent
+			WHERE POI.item_code IN %(item_codes)s AND PO.docstatus = 1 AND POI.qty > POI.received_qty
+			GROUP BY POI.item_code, IFNULL(POI.warehouse, '')
+			""",
+			params,
+		),
+		(
+			"Landed Cost Voucher charges by item",
+			"""
+			SELECT LCI.receipt_document_type, LCI.receipt_document, LCI.applicable_charges, LCV.name
+			FROM `tabLanded Cost Voucher` LCV
+			INNER JOIN `tabLanded Cost Item` LCI ON LCV.name = LCI.parent
+			WHERE LCI.item_code = %(item_code)s AND LCV.docstatus = 1
+			ORDER BY LCV.posting_date DESC, LCV.creation DESC, LCI.idx
+			LIMIT 1
+			""",
+			params,
+		),
+		(
+			"Item Price rows by item",
+			"""
+			SELECT name, item_code, stock_warehouse
+			FROM `tabItem Price`
+			WHERE item_code IN %(item_codes)s
+			""",
+			params,
+		),
+	]
+
@@ -157,29 +157,78 @@ doc_events = {
 		"on_update_after_submit": "apex_item.item_price_hooks.update_item_prices_from_sales_order",
 	},
 	"Purchase Order": {
-		"on_submit": "apex_item.item_foreign_purchase_hooks.update_item_foreign_purchase_info",
-		"on_cancel": "apex_item.item_foreign_purchase_hooks.update_item_foreign_purchase_info",
+		"on_submit": [
+			"apex_item.open_purchase_qty.update_open_purchase_qty_from_doc",
+			"apex_item.purchase_ledger.update_purchase_ledger_from_doc",
+			"apex_item.item_price_hooks.update_item_prices_from_purchase_order",
+			"apex_item.item_foreign_purchase_hooks.update_item_foreign_purchase_info"
+		],
+		"on_cancel": [
+			"apex_item.open_purchase_qty.update_open_purchase_qty_from_doc",
+			"apex_item.purchase_ledger.update_purchase_ledger_from_doc",
+			"apex_item.item_price_hooks.update_item_prices_from_purchase_order",
+			"apex_item.item_foreign_purchase_hooks.update_item_foreign_purchase_info"
+		],
+		"on_update_after_submit": [
+			"apex_item.open_purchase_qty.update_open_purchase_qty_from_doc",
+			"apex_item.purchase_ledger.update_purchase_ledger_from_doc",
+			"apex_item.item_price_hooks.update_item_prices_from_purchase_order",
+		],
 	},
 	"Landed Cost Voucher": {
-		"on_submit": "apex_item.item_foreign_purchase_hooks.update_item_foreign_purchase_info_from_lcv",
-		"on_cancel": "apex_item.item_foreign_purchase_hooks.update_item_foreign_purchase_info_from_lcv",
+		"on_submit": [
+			"apex_item.purchase_ledger.update_purchase_ledger_from_lcv",
+			"apex_item.item_foreign_purchase_hooks.update_item_foreign_purchase_info_from_lcv",
+		],
+		"on_cancel": [
+			"apex_item.purchase_ledger.update_purchase_ledger_from_lcv",
+			"apex_item.item_foreign_purchase_hooks.update_item_foreign_purchase_info_from_lcv",
+		],
 	},
 	"Purchase Receipt": {
 		"on_submit": [
+			"apex_item.open_purchase_qty.update_open_purchase_qty_from_doc",
+			"apex_item.purchase_ledger.update_purchase_ledger_from_doc",
 			"apex_item.item_price_hooks.update_item_prices_from_purchase_receipt",
 			"apex_item.item_foreign_purchase_hooks.update_item_foreign_purchase_info"
 		],
 		"on_cancel": [
+			"apex_item.open_purchase_qty.update_open_purchase_qty_from_doc",
+			"apex_item.purchase_ledger.update_purchase_ledger_from_doc",
 			"apex_item.item_price_hooks.update_item_prices_from_purchase_receipt",
 			"apex_item.item_foreign_purchase_hooks.update_item_foreign_purchase_info"
 		],
 	},
 	"Purchase Invoice": {
-		"on_submit": "apex_item.item_foreign_purchase_hooks.update_item_foreign_purchase_info",
-		"on_cancel": "apex_item.item_foreign_purchase_hooks.update_item_foreign_purchase_info",
+		"on_submit": [
+			"apex_item.open_purchase_qty.update_open_purchase_qty_from_invoice",
+			"apex_item.purchase_ledger.update_purchase_ledger_from_doc",
+			"apex_item.item_foreign_purchase_hooks.update_item_foreign_purchase_info",
+		],
+		"on_cancel": [
+			"apex_item.open_purchase_qty.update_open_purchase_qty_from_invoice",
+			"apex_item.purchase_ledger.update_purchase_ledger_from_doc",
+			"apex_item.item_foreign_purchase_hooks.update_item_foreign_purchase_info",
+		],
+	},
+	"Subcontracting Receipt": {
+		"on_submit": "apex_item.open_purchase_qty.update_open_purchase_qty_from_subcontracting_receipt",
+		"on_cancel": "apex_item.open_purchase_qty.update_open_purchase_qty_from_subcontracting_receipt",
 	},
 	"Item": {
 		"validate": "apex_item.item_foreign_purchase_hooks.update_item_on_save",
+		"on_update": "apex_item.item_price_hooks.clear_item_default_warehouse_cache",
+		"on_trash": "apex_item.item_price_hooks.clear_item_default_warehouse_cache",
+	},
+	"Warehouse": {
+		"on_update": "apex_item.warehouse_tree.clear_warehouse_tree_cache",
+		"on_trash": "apex_item.warehouse_tree.clear_warehouse_tree_cache",
+		"after_rename": "apex_item.warehouse_tree.clear_warehouse_tree_cache",
+	},
+	"Company": {
+		"on_update": "apex_item.item_foreign_purchase.clear_company_defaults_cache",
+		"on_trash": "apex_item.item_foreign_purchase.clear_company_defaults_cache",
+		"after_rename": "apex_item.item_foreign_purchase.clear_company_defaults_cache",
 	},
 }
 
@@ -7,7 +7,18 @@ from pathlib import Path
 
 import frappe
 
+from apex_item.db_indexes import ensure_indexes
 from apex_item.item_price_config import get_default_card_config
+from apex_item.open_purchase_qty import (
+	OPEN_PURCHASE_QTY_TABLE,
+	drop_open_purchase_qty_table,
+	ensure_open_purchase_qty_table,
+)
+from apex_item.purchase_ledger import (
+	PURCHASE_LEDGER_TABLE,
+	drop_purchase_ledger_table,
+	ensure_purchase_ledger_table,
+)
 
 
 def after_install() -> None:
@@ -23,6 +34,12 @@ def after_install() -> None:
 		# Setup card settings
 		setup_item_price_card_setting()
 
+		# App-owned aggregate tables
+		setup_app_tables()
+
+		# Indexes for the stock snapshot and purchase lookups
+		setup_app_indexes()
+
 		# Commit all changes atomically
 		frappe.db.commit()
 
@@ -52,6 +69,8 @@ def after_migrate() -> None:
 		# Import custom fields to ensure they exist after migration
 		import_custom_fields()
 		setup_item_price_card_setting()
+		setup_app_tables()
+		setup_app_indexes()
 		
 		# Trigger background update of foreign purchase info
 		print("\n⏳ Triggering background job to update Foreign Purchase Info...")
@@ -73,6 +92,7 @@ def before_uninstall() -> None:
 		remove_property_setters()
 		remove_custom_columns()
 		remove_item_price_card_settings()
+		remove_app_tables()
 
 		frappe.db.commit()
 
@@ -168,6 +188,8 @@ def remove_custom_fields() -> None:
 			"waiting_qty",
 			"item_group",
 			"item_image",
+			"stock_synced_at",
+			"stock_sync_source",
 		],
 		"Item": [
 			"item_foreign_purchase_section",
@@ -339,6 +361,46 @@ def remove_item_price_card_settings() -> None:
 	print("  ✓ Item Price card setting cleanup complete!\n")
 
 
+def setup_app_tables() -> None:
+	"""Create and fill the app-owned aggregate tables."""
+	for label, table, ensure, _drop in _get_app_tables():
+		print(f"\n📦 Checking {label} table...")
+		if ensure():
+			print(f"  ✅ Created and filled: {table}")
+		else:
+			print(f"  ⏭️  {table} already exists, skipping...")
+
+
+def setup_app_indexes() -> None:
+	"""Create the composite indexes used by the app's hot queries."""
+	print("\n🗂️  Checking Apex Item indexes...")
+	for result in ensure_indexes():
+		label = f"{result['table']}({', '.join(result['columns'])})"
+		if result["status"] == "created":
+			print(f"  ✅ Created index {result['index']} on {label}")
+		elif result["status"] == "failed":
+			print(f"  ❌ Failed to create index on {label}: {result.get('error', 'not found after create')}")
+		else:
+			print(f"  ⏭️  {label} already indexed by {result['index']}, skipping...")
+
+
+def remove_app_tables() -> None:
+	"""Drop the app-owned aggregate tables."""
+	for _label, table, _ensure, drop in _get_app_tables():
+		try:
+			drop()
+			print(f"  ✅ Dropped table: {table}")
+		except Exception as exc:
+			print(f"  ❌ Failed to drop table {table}: {exc}")
+
+
+def _get_app_tables() -> list[tuple]:
+	return [
+		("open purchase quantity", OPEN_PURCHASE_QTY_TABLE, ensure_open_purchase_qty_table, drop_open_purchase_qty_table),
+		("purchase ledger", PURCHASE_LEDGER_TABLE, ensure_purchase_ledger_table, drop_purchase_ledger_table),
+	]
+
+
 def setup_item_price_card_setting() -> None:
 	"""Create a default Item Price Card Setting document if none exists yet."""
 	if not frappe.db.exists("DocType", "Item Price Card Setting"):
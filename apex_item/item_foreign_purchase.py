@@ -4,7 +4,22 @@ API لجلب آخر سعر شراء بالعملة الأجنبية
 import frappe
 from frappe.utils import flt
 from frappe.utils import flt, getdate
-from frappe.query_builder import DocType, Order
+
+from apex_item.purchase_ledger import get_purchase_ledger_rows
+
+# Purchase documents in tie-break order: on equal dates the earlier one wins
+_PURCHASE_DOCTYPES = ("Purchase Invoice", "Purchase Receipt", "Purchase Order")
+_PURCHASE_DATE_FIELDS = {
+	"Purchase Invoice": "posting_date",
+	"Purchase Receipt": "posting_date",
+	"Purchase Order": "transaction_date",
+}
+# Documents a Landed Cost Voucher can charge
+_LCV_RECEIPT_DOCTYPES = ("Purchase Invoice", "Purchase Receipt")
+
+_COMPANY_DEFAULTS_CACHE_KEY = "apex_item:company_defaults"
+# Company fields the purchase engine reads
+_COMPANY_FIELDS = ("default_currency",)
 
 
 @frappe.whitelist()
@@ -30,92 +45,236 @@ def get_item_foreign_purchase_info(item_code):
 	if not item_code:
 		return {}
 	
+	# جدول سجل المشتريات يغني عن البحث في وثائق الشراء
+	ledger_rows = get_purchase_ledger_rows(item_code)
+	if ledger_rows is not None:
+		purchase, total_charges_egp, lcv_name = _pick_ledger_purchase(ledger_rows)
+		if not purchase:
+			return {}
+		company_currency = _get_company_currency(purchase.doc.get("company"))
+		return _build_purchase_info(purchase, total_charges_egp, lcv_name, company_currency)
+
 	# أولاً: البحث عن آخر Landed Cost Voucher للصنف
 	# هذا مهم لأننا نريد أن يكون السعر والرسوم من نفس الوثيقة
-	lcv_result = _get_last_lcv_charges_for_item(item_code)
-	lcv_name = lcv_result.get("lcv_name")
-	total_charges_egp = lcv_result.get("charges", 0)
+	latest_lcv = _get_item_lcv_row(item_code)
+	lcv_name = None
+	total_charges_egp = 0.0
+	if latest_lcv and flt(latest_lcv.applicable_charges):
+		lcv_name = latest_lcv.lcv_name
+		total_charges_egp = flt(latest_lcv.applicable_charges)
 	
 	# إذا وجدنا LCV، نستخدم الوثيقة المرتبطة به
-	last_purchase = None
-	voucher_type = None
-	voucher_no = None
-	purchase_date = None
-	
+	purchase = None
 	if lcv_name:
-		# جلب الوثيقة المرتبطة بـ LCV
-		lcv_doc = frappe.get_doc("Landed Cost Voucher", lcv_name)
-		if lcv_doc.items:
-			# البحث عن الصنف في LCV
-			for lcv_item in lcv_doc.items:
-				if lcv_item.item_code == item_code:
-					receipt_doc_type = lcv_item.receipt_document_type
-					receipt_doc_name = lcv_item.receipt_document
-					
-					if receipt_doc_type == "Purchase Invoice":
-						pi = _get_purchase_document("Purchase Invoice", receipt_doc_name, item_code)
-						if pi:
-							last_purchase = pi
-							voucher_type = "Purchase Invoice"
-							voucher_no = receipt_doc_name
-							purchase_date = getdate(pi.get("posting_date"))
-							break
-					elif receipt_doc_type == "Purchase Receipt":
-						pr = _get_purchase_document("Purchase Receipt", receipt_doc_name, item_code)
-						if pr:
-							pr_date = getdate(pr.get("posting_date"))
-							if not purchase_date or pr_date > purchase_date:
-								last_purchase = pr
-								voucher_type = "Purchase Receipt"
-								voucher_no = receipt_doc_name
-								purchase_date = pr_date
+		purchase = _pick_lcv_purchase(_get_lcv_purchase_rows({(lcv_name, item_code)}).get((lcv_name, item_code), ()))
 	
 	# Fallback: إذا لم نجد وثيقة مرتبطة بـ LCV، نبحث عن آخر وثيقة شراء
-	if not last_purchase:
-		last_pi = _get_last_purchase_invoice(item_code)
-		last_pr = _get_last_purchase_receipt(item_code)
-		last_po = _get_last_purchase_order(item_code)
-		
-		if last_pi:
-			last_purchase = last_pi
-			voucher_type = "Purchase Invoice"
-			voucher_no = last_pi.get("name")
-			purchase_date = getdate(last_pi.get("posting_date"))
-		
-		if last_pr:
-			pr_date = getdate(last_pr.get("posting_date"))
-			if not purchase_date or pr_date > purchase_date:
-				last_purchase = last_pr
-				voucher_type = "Purchase Receipt"
-				voucher_no = last_pr.get("name")
-				purchase_date = pr_date
-				
-		if last_po:
-			po_date = getdate(last_po.get("transaction_date"))
-			if not purchase_date or po_date > purchase_date:
-				last_purchase = last_po
-				voucher_type = "Purchase Order"
-				voucher_no = last_po.get("name")
-				purchase_date = po_date
+	if not purchase:
+		purchase = _get_last_purchase(item_code)
 		
 		# إذا لم نجد LCV، نبحث عن LCV مرتبط بالوثيقة الحالية
-		if last_purchase and total_charges_egp == 0:
-			result = _get_lcv_charges(voucher_type, voucher_no, item_code)
-			total_charges_egp = result.get("charges", 0)
-			if not lcv_name:
-				lcv_name = result.get("lcv_name")
+		if purchase and total_charges_egp == 0 and purchase.voucher_type in _LCV_RECEIPT_DOCTYPES:
+			linked = _get_item_lcv_row(item_code, purchase.voucher_type, purchase.voucher_no)
+			if linked and flt(linked.applicable_charges):
+				total_charges_egp = flt(linked.applicable_charges)
+				lcv_name = linked.lcv_name
 	
-	if not last_purchase:
+	if not purchase:
 		return {}
 	
+	company_currency = _get_company_currency(purchase.doc.get("company"))
+	return _build_purchase_info(purchase, total_charges_egp, lcv_name, company_currency)
+
+
+def get_items_foreign_purchase_info(item_codes=None):
+	"""
+	Bulk variant of `get_item_foreign_purchase_info` for many items at once.
+
+	Each source (latest LCV line, latest PI / PR / PO line and the LCVs linked
+	to the fallback winners) is read with one ROW_NUMBER-ranked query for all
+	items, and the receipts of the winning LCVs with one join; the results are merged in memory
+	with the same precedence as the single-item path.
+	`item_codes=None` covers every item with a submitted purchase document.
+	Returns {item_code: purchase info} for items that have one.
+	"""
+	params = {}
+	if item_codes is not None:
+		item_codes = tuple(sorted({item_code for item_code in item_codes if item_code}))
+		if not item_codes:
+			return {}
+		params["item_codes"] = item_codes
+
+	latest_lcvs = {
+		row.item_code: row
+		for row in _get_ranked_lcv_rows("LCI.item_code", params)
+		if flt(row.applicable_charges)
+	}
+	lcv_purchases = _get_lcv_purchase_rows({(row.lcv_name, item_code) for item_code, row in latest_lcvs.items()})
+	last_docs = {
+		doctype: {row.item_code: row for row in _get_ranked_purchase_rows(doctype, params)}
+		for doctype in _PURCHASE_DOCTYPES
+	}
+
+	matches = {}
+	for item_code in sorted(set().union(*last_docs.values())):
+		lcv = latest_lcvs.get(item_code)
+		charges, lcv_name = (flt(lcv.applicable_charges), lcv.lcv_name) if lcv else (0.0, None)
+
+		purchase = None
+		if lcv_name:
+			purchase = _pick_lcv_purchase(lcv_purchases.get((lcv_name, item_code), ()))
+		if not purchase:
+			purchase = _pick_latest_purchase(*(last_docs[doctype].get(item_code) for doctype in _PURCHASE_DOCTYPES))
+		if purchase:
+			matches[item_code] = [purchase, charges, lcv_name]
+
+	# Fallback winners without charges take them from an LCV linked to that document
+	linked_lcvs = {}
+	if any(not charges for _purchase, charges, _lcv_name in matches.values()):
+		linked_lcvs = {
+			(row.receipt_document_type, row.receipt_document, row.item_code): row
+			for row in _get_ranked_lcv_rows(
+				"LCI.receipt_document_type, LCI.receipt_document, LCI.item_code", params
+			)
+		}
+
+	results = {}
+	for item_code, (purchase, charges, lcv_name) in matches.items():
+		if not charges:
+			linked = linked_lcvs.get((purchase.voucher_type, purchase.voucher_no, item_code))
+			if linked and flt(linked.applicable_charges):
+				charges = flt(linked.applicable_charges)
+				lcv_name = lcv_name or linked.lcv_name
+		results[item_code] = _build_purchase_info(
+			purchase, charges, lcv_name, _get_company_currency(purchase.doc.get("company"))
+		)
+	return results
+
+
+def get_foreign_purchase_item_values(purchase_info):
+	"""Map a purchase info dict onto the Item fields it fills; an empty one clears them."""
+	purchase_info = purchase_info or {}
+	return {
+		"item_foreign_purchase_rate": purchase_info.get("rate") or 0,
+		"item_foreign_purchase_currency": purchase_info.get("currency"),
+		"custom_item_foreign_purchase_date": purchase_info.get("purchase_date") or None,
+		"item_foreign_purchase_voucher_type": purchase_info.get("voucher_type"),
+		"item_foreign_purchase_voucher_no": purchase_info.get("voucher_no"),
+		"item_foreign_purchase_supplier": purchase_info.get("supplier") or None,
+		"item_foreign_purchase_applicable_charges": purchase_info.get("applicable_charges") or 0,
+		"item_foreign_purchase_lcv": purchase_info.get("lcv_name"),
+	}
+
+
+def get_company_defaults():
+	"""
+	Return {company: {fieldname: value}} for the Company fields the engine reads.
+	Kept in Redis until a Company changes and memoized by frappe.cache() for the
+	rest of the request or job.
+	"""
+	return frappe.cache().get_value(_COMPANY_DEFAULTS_CACHE_KEY, generator=_load_company_defaults) or {}
+
+
+def clear_company_defaults_cache(doc=None, method=None):
+	"""Doc event helper for Company save, trash and rename."""
+	try:
+		frappe.cache().delete_value(_COMPANY_DEFAULTS_CACHE_KEY)
+	except Exception:
+		frappe.log_error(frappe.get_traceback(), "Apex Item: Clear Company Defaults Cache")
+
+
+def _load_company_defaults():
+	return {
+		row.name: {fieldname: row.get(fieldname) for fieldname in _COMPANY_FIELDS}
+		for row in frappe.get_all("Company", fields=["name", *_COMPANY_FIELDS])
+	}
+
+
+def _get_company_currency(company):
+	return (get_company_defaults().get(company) or {}).get("default_currency")
+
+
+def _pick_lcv_purchase(receipts):
+	"""
+	Pick the purchase document behind an LCV from (doctype, name, row) entries in
+	LCV line order: the first Purchase Invoice wins, otherwise the latest
+	Purchase Receipt. Rows that are None (not submitted) are ignored.
+	"""
+	purchase = None
+	for doctype, name, row in receipts:
+		if not row:
+			continue
+		purchase_date = getdate(row.get("purchase_date") or row.get("posting_date"))
+		if doctype == "Purchase Invoice":
+			return frappe._dict(doc=row, voucher_type=doctype, voucher_no=name, purchase_date=purchase_date)
+		if doctype == "Purchase Receipt" and (not purchase or purchase_date > purchase.purchase_date):
+			purchase = frappe._dict(doc=row, voucher_type=doctype, voucher_no=name, purchase_date=purchase_date)
+	return purchase
+
+
+def _pick_latest_purchase(last_pi, last_pr, last_po):
+	"""
+	Pick the latest of the last PI, PR and PO rows. On equal dates the invoice
+	beats the receipt and the receipt beats the order.
+	"""
+	purchase = None
+	for doctype, row in zip(_PURCHASE_DOCTYPES, (last_pi, last_pr, last_po), strict=True):
+		if not row:
+			continue
+		purchase_date = getdate(row.get(_PURCHASE_DATE_FIELDS[doctype]))
+		if not purchase or purchase_date > purchase.purchase_date:
+			purchase = frappe._dict(
+				doc=row, voucher_type=doctype, voucher_no=row.get("name"), purchase_date=purchase_date
+			)
+	return purchase
+
+
+def _pick_ledger_purchase(rows):
+	"""
+	Apply the same precedence to purchase ledger rows (latest purchase first).
+	Returns (purchase, charges, lcv_name); purchase is None without rows.
+	"""
+	if not rows:
+		return None, 0.0, None
+
+	# The item's latest LCV line: newest voucher, then its first line
+	latest_lcv = max(
+		(row for row in rows if row.lcv_name),
+		key=lambda row: (row.lcv_posting_date, row.lcv_creation, -row.lcv_idx),
+		default=None,
+	)
+	charges, lcv_name = 0.0, None
+	if latest_lcv and flt(latest_lcv.lcv_charges):
+		charges, lcv_name = flt(latest_lcv.lcv_charges), latest_lcv.lcv_name
+
+	purchase = None
+	if lcv_name:
+		purchase = _pick_lcv_purchase(
+			(row.voucher_type, row.voucher_no, row)
+			for row in sorted(rows, key=lambda row: row.lcv_idx or 0)
+			if row.lcv_name == lcv_name
+		)
+	if not purchase:
+		row = rows[0]
+		purchase = frappe._dict(
+			doc=row, voucher_type=row.voucher_type, voucher_no=row.voucher_no, purchase_date=getdate(row.purchase_date)
+		)
+		if not charges and flt(row.lcv_charges):
+			charges, lcv_name = flt(row.lcv_charges), row.lcv_name
+	return purchase, charges, lcv_name
+
+
+def _build_purchase_info(purchase, total_charges_egp, lcv_name, company_currency):
+	"""Compute the foreign-currency rate and charges of the picked purchase document."""
+	last_purchase = purchase.doc
+	purchase_date = purchase.purchase_date
 	conversion_rate = flt(last_purchase.get("conversion_rate")) or 1.0
 	conversion_factor = flt(last_purchase.get("conversion_factor")) or 1.0
 	base_net_rate = flt(last_purchase.get("base_net_rate")) or 0
 	
 	# حساب السعر بالعملة الأجنبية
 	# إذا كانت العملة هي العملة الأساسية (EGP)، لا نحتاج للتحويل
-	currency = last_purchase.get("currency") or frappe.db.get_value("Company", last_purchase.get("company"), "default_currency")
-	company_currency = frappe.db.get_value("Company", last_purchase.get("company"), "default_currency")
+	currency = last_purchase.get("currency") or company_currency
 	
 	if currency == company_currency:
 		# العملة الأساسية - السعر هو base_net_rate
@@ -140,302 +299,184 @@ def get_item_foreign_purchase_info(item_code):
 
 	return {
 		"rate": rate_in_currency,
-		"currency": last_purchase.get("currency") or frappe.db.get_value("Company", last_purchase.get("company"), "default_currency"),
+		"currency": currency,
 		"base_rate": base_net_rate / conversion_factor if conversion_factor > 0 else 0,
 		"conversion_rate": conversion_rate,
 		"purchase_date": purchase_date.strftime("%Y-%m-%d") if purchase_date else "",
-		"voucher_type": voucher_type,
-		"voucher_no": voucher_no,
+		"voucher_type": purchase.voucher_type,
+		"voucher_no": purchase.voucher_no,
 		"supplier": last_purchase.get("supplier") or "",
 		"applicable_charges": applicable_charges,
 		"lcv_name": lcv_name
 	}
 
 
-def _get_lcv_charges(receipt_document_type, receipt_document, item_code):
-	"""
-	جلب Applicable Charges ورقم LCV من Landed Cost Voucher لصنف محدد في وثيقة شراء.
-	
-	Args:
-		receipt_document_type: نوع الوثيقة (Purchase Receipt أو Purchase Invoice)
-		receipt_document: رقم الوثيقة
-		item_code: كود الصنف
-	
-	Returns:
-		dict: {
-			"charges": float,  # Applicable Charges بالعملة المحلية (EGP)
-			"lcv_name": str   # رقم Landed Cost Voucher
-		}
-	"""
-	# البحث عن Landed Cost Voucher المرتبط بالوثيقة
-	LCV = DocType("Landed Cost Voucher")
-	LCItem = DocType("Landed Cost Item")
-	
-	query = (
-		frappe.qb.from_(LCV)
-		.join(LCItem).on(LCV.name == LCItem.parent)
-		.select(LCItem.applicable_charges, LCV.name.as_("lcv_name"))
-		.where(
-			(LCItem.receipt_document_type == receipt_document_type)
-			& (LCItem.receipt_document == receipt_document)
-			& (LCItem.item_code == item_code)
-			& (LCV.docstatus == 1)
-		)
-		.orderby(LCV.posting_date, order=Order.desc)
-		.orderby(LCV.creation, order=Order.desc)
-		.limit(1)
+def _get_ranked_purchase_rows(doctype, params):
+	"""Latest submitted line of `doctype` per item, newest document first."""
+	date_field = _PURCHASE_DATE_FIELDS[doctype]
+	conditions = ["P.docstatus = 1"]
+	if "item_codes" in params:
+		conditions.append("I.item_code IN %(item_codes)s")
+
+	return frappe.db.sql(
+		f"""
+		SELECT * FROM (
+			SELECT
+				P.name, P.{date_field}, P.currency, P.conversion_rate, P.supplier, P.company,
+				I.item_code, I.base_net_rate, I.conversion_factor,
+				ROW_NUMBER() OVER (
+					PARTITION BY I.item_code
+					ORDER BY P.{date_field} DESC, P.creation DESC, I.idx
+				) AS row_rank
+			FROM `tab{doctype}` P
+			INNER JOIN `tab{doctype} Item` I ON I.parent = P.name
+			WHERE {" AND ".join(conditions)}
+		) ranked
+		WHERE row_rank = 1
+		""",
+		params,
+		as_dict=True,
 	)
-	
-	result = query.run(as_dict=True)
-	
-	if result and result[0].get("applicable_charges"):
-		return {
-			"charges": flt(result[0].get("applicable_charges")),
-			"lcv_name": result[0].get("lcv_name")
-		}
-	
-	# Fallback: البحث في جميع Landed Cost Vouchers التي تحتوي على الصنف
-	# (في حالة عدم وجود receipt_document محدد)
-	fallback_query = (
-		frappe.qb.from_(LCV)
-		.join(LCItem).on(LCV.name == LCItem.parent)
-		.select(LCItem.applicable_charges, LCV.name.as_("lcv_name"))
-		.where(
-			(LCItem.item_code == item_code)
-			& (LCV.docstatus == 1)
-		)
-		.orderby(LCV.posting_date, order=Order.desc)
-		.orderby(LCV.creation, order=Order.desc)
-		.limit(1)
+
+
+def _get_ranked_lcv_rows(partition_by, params):
+	"""Latest submitted Landed Cost Item line per `partition_by` group."""
+	conditions = ["LCV.docstatus = 1"]
+	if "item_codes" in params:
+		conditions.append("LCI.item_code IN %(item_codes)s")
+
+	return frappe.db.sql(
+		f"""
+		SELECT * FROM (
+			SELECT
+				LCI.item_code, LCI.receipt_document_type, LCI.receipt_document,
+				LCI.applicable_charges, LCV.name AS lcv_name,
+				ROW_NUMBER() OVER (
+					PARTITION BY {partition_by}
+					ORDER BY LCV.posting_date DESC, LCV.creation DESC, LCI.idx
+				) AS row_rank
+			FROM `tabLanded Cost Voucher` LCV
+			INNER JOIN `tabLanded Cost Item` LCI ON LCV.name = LCI.parent
+			WHERE {" AND ".join(conditions)}
+		) ranked
+		WHERE row_rank = 1
+		""",
+		params,
+		as_dict=True,
 	)
-	
-	fallback_result = fallback_query.run(as_dict=True)
-	
-	if fallback_result and fallback_result[0].get("applicable_charges"):
-		return {
-			"charges": flt(fallback_result[0].get("applicable_charges")),
-			"lcv_name": fallback_result[0].get("lcv_name")
-		}
-	
-	return {"charges": 0.0, "lcv_name": None}
 
 
-def _get_last_lcv_charges_for_item(item_code):
+def _get_lcv_purchase_rows(lcv_items):
 	"""
-	جلب آخر Applicable Charges ورقم LCV من Landed Cost Voucher للصنف (بغض النظر عن الوثيقة).
-	
-	هذه الدالة مفيدة عندما لا تكون الوثيقة الحالية مرتبطة بـ Landed Cost Voucher،
-	لكن نريد عرض آخر رسوم تم توزيعها على الصنف.
-	
-	Args:
-		item_code: كود الصنف
-	
-	Returns:
-		dict: {
-			"charges": float,  # Applicable Charges بالعملة المحلية (EGP)
-			"lcv_name": str   # رقم Landed Cost Voucher
-		}
+	Join the lines of the given (lcv_name, item_code) pairs to their submitted
+	Purchase Invoice / Receipt line of the same item.
+	Returns {(lcv_name, item_code): [(receipt doctype, receipt name, purchase row)]}
+	in LCV line order; lines whose receipt is not submitted are left out.
 	"""
-	LCV = DocType("Landed Cost Voucher")
-	LCItem = DocType("Landed Cost Item")
-	
-	query = (
-		frappe.qb.from_(LCV)
-		.join(LCItem).on(LCV.name == LCItem.parent)
-		.select(LCItem.applicable_charges, LCV.name.as_("lcv_name"))
-		.where(
-			(LCItem.item_code == item_code)
-			& (LCV.docstatus == 1)
+	if not lcv_items:
+		return {}
+
+	branches = []
+	for doctype in _LCV_RECEIPT_DOCTYPES:
+		branches.append(
+			f"""
+			SELECT
+				LCI.parent AS lcv_name, LCI.item_code, LCI.idx AS lcv_idx,
+				LCI.receipt_document_type, LCI.receipt_document,
+				P.name, P.posting_date, P.currency, P.conversion_rate, P.supplier, P.company,
+				I.base_net_rate, I.conversion_factor, I.idx AS item_idx
+			FROM `tabLanded Cost Item` LCI
+			INNER JOIN `tab{doctype}` P ON P.name = LCI.receipt_document AND P.docstatus = 1
+			INNER JOIN `tab{doctype} Item` I ON I.parent = P.name AND I.item_code = LCI.item_code
+			WHERE LCI.receipt_document_type = '{doctype}'
+				AND LCI.parent IN %(lcv_names)s AND LCI.item_code IN %(item_codes)s
+			"""
 		)
-		.orderby(LCV.posting_date, order=Order.desc)
-		.orderby(LCV.creation, order=Order.desc)
-		.limit(1)
-	)
-	
-	result = query.run(as_dict=True)
-	
-	if result and result[0].get("applicable_charges"):
-		return {
-			"charges": flt(result[0].get("applicable_charges")),
-			"lcv_name": result[0].get("lcv_name")
-		}
-	
-	return {"charges": 0.0, "lcv_name": None}
 
-	return {
-		"rate": rate_in_currency,
-		"currency": last_purchase.get("currency") or frappe.db.get_value("Company", last_purchase.get("company"), "default_currency"),
-		"base_rate": base_net_rate / conversion_factor if conversion_factor > 0 else 0,
-		"conversion_rate": conversion_rate,
-		"purchase_date": purchase_date.strftime("%Y-%m-%d") if purchase_date else "",
-		"voucher_type": voucher_type,
-		"voucher_no": voucher_no,
-		"supplier": last_purchase.get("supplier") or "",
-		"applicable_charges": applicable_charges
-	}
+	purchases = {}
+	seen_lines = set()
+	for row in frappe.db.sql(
+		f"""
+		{" UNION ALL ".join(branches)}
+		ORDER BY lcv_name, lcv_idx, item_idx
+		""",
+		{
+			"lcv_names": tuple({lcv_name for lcv_name, _item_code in lcv_items}),
+			"item_codes": tuple({item_code for _lcv_name, item_code in lcv_items}),
+		},
+		as_dict=True,
+	):
+		key = (row.lcv_name, row.item_code)
+		# One purchase row per LCV line, the first line of the item in the receipt
+		if key not in lcv_items or (row.lcv_name, row.lcv_idx) in seen_lines:
+			continue
+		seen_lines.add((row.lcv_name, row.lcv_idx))
+		purchases.setdefault(key, []).append((row.receipt_document_type, row.receipt_document, row))
+	return purchases
 
 
-def _get_purchase_document(doctype, doc_name, item_code):
+def _get_last_purchase(item_code):
 	"""
-	جلب بيانات وثيقة شراء مع السعر للصنف.
-	
-	Args:
-		doctype: نوع الوثيقة (Purchase Invoice, Purchase Receipt, Purchase Order)
-		doc_name: رقم الوثيقة
-		item_code: كود الصنف
-	
-	Returns:
-		dict: بيانات الوثيقة مع السعر
+	Latest submitted PI, PR or PO line of the item from one UNION ALL query.
+	Documents are ranked by their date, then PI > PR > PO, then newest creation.
 	"""
-	if doctype == "Purchase Invoice":
-		PI = DocType("Purchase Invoice")
-		PIItem = DocType("Purchase Invoice Item")
-		
-		query = (
-			frappe.qb.from_(PI)
-			.join(PIItem).on(PI.name == PIItem.parent)
-			.select(
-				PI.name,
-				PI.posting_date,
-				PI.currency,
-				PI.conversion_rate,
-				PI.supplier,
-				PI.company,
-				PIItem.base_net_rate,
-				PIItem.conversion_factor
-			)
-			.where(
-				(PI.name == doc_name)
-				& (PIItem.item_code == item_code)
-				& (PI.docstatus == 1)
-			)
-			.limit(1)
+	branches = []
+	for priority, doctype in enumerate(_PURCHASE_DOCTYPES, 1):
+		branches.append(
+			f"""
+			SELECT
+				'{doctype}' AS voucher_type, {priority} AS priority, P.name,
+				P.{_PURCHASE_DATE_FIELDS[doctype]} AS purchase_date, P.creation,
+				P.currency, P.conversion_rate, P.supplier, P.company,
+				I.base_net_rate, I.conversion_factor
+			FROM `tab{doctype}` P
+			INNER JOIN `tab{doctype} Item` I ON I.parent = P.name
+			WHERE I.item_code = %(item_code)s AND P.docstatus = 1
+			"""
 		)
-		
-		result = query.run(as_dict=True)
-		return result[0] if result else None
-	
-	elif doctype == "Purchase Receipt":
-		PR = DocType("Purchase Receipt")
-		PRItem = DocType("Purchase Receipt Item")
-		
-		query = (
-			frappe.qb.from_(PR)
-			.join(PRItem).on(PR.name == PRItem.parent)
-			.select(
-				PR.name,
-				PR.posting_date,
-				PR.currency,
-				PR.conversion_rate,
-				PR.supplier,
-				PR.company,
-				PRItem.base_net_rate,
-				PRItem.conversion_factor
-			)
-			.where(
-				(PR.name == doc_name)
-				& (PRItem.item_code == item_code)
-				& (PR.docstatus == 1)
-			)
-			.limit(1)
-		)
-		
-		result = query.run(as_dict=True)
-		return result[0] if result else None
-	
-	return None
 
-
-def _get_last_purchase_order(item_code):
-	"""جلب آخر Purchase Order للصنف"""
-	PO = DocType("Purchase Order")
-	POItem = DocType("Purchase Order Item")
-	
-	query = (
-		frappe.qb.from_(PO)
-		.join(POItem).on(PO.name == POItem.parent)
-		.select(
-			PO.name,
-			PO.transaction_date,
-			PO.currency,
-			PO.conversion_rate,
-			PO.supplier,
-			PO.company,
-			POItem.base_net_rate,
-			POItem.conversion_factor
-		)
-		.where(
-			(POItem.item_code == item_code)
-			& (PO.docstatus == 1)
-		)
-		.orderby(PO.transaction_date, order=Order.desc)
-		.orderby(PO.creation, order=Order.desc)
-		.limit(1)
+	result = frappe.db.sql(
+		f"""
+		SELECT * FROM ({" UNION ALL ".join(branches)}) purchases
+		ORDER BY purchase_date DESC, priority, creation DESC
+		LIMIT 1
+		""",
+		{"item_code": item_code},
+		as_dict=True,
 	)
-	
-	result = query.run(as_dict=True)
-	return result[0] if result else None
-
+	if not result:
+		return None
 
-def _get_last_purchase_receipt(item_code):
-	"""جلب آخر Purchase Receipt للصنف"""
-	PR = DocType("Purchase Receipt")
-	PRItem = DocType("Purchase Receipt Item")
-	
-	query = (
-		frappe.qb.from_(PR)
-		.join(PRItem).on(PR.name == PRItem.parent)
-		.select(
-			PR.name,
-			PR.posting_date,
-			PR.currency,
-			PR.conversion_rate,
-			PR.supplier,
-			PR.company,
-			PRItem.base_net_rate,
-			PRItem.conversion_factor
-		)
-		.where(
-			(PRItem.item_code == item_code)
-			& (PR.docstatus == 1)
-		)
-		.orderby(PR.posting_date, order=Order.desc)
-		.orderby(PR.creation, order=Order.desc)
-		.limit(1)
+	row = result[0]
+	return frappe._dict(
+		doc=row, voucher_type=row.voucher_type, voucher_no=row.name, purchase_date=getdate(row.purchase_date)
 	)
-	
-	result = query.run(as_dict=True)
-	return result[0] if result else None
 
 
-def _get_last_purchase_invoice(item_code):
-	"""جلب آخر Purchase Invoice للصنف"""
-	PI = DocType("Purchase Invoice")
-	PIItem = DocType("Purchase Invoice Item")
-	
-	query = (
-		frappe.qb.from_(PI)
-		.join(PIItem).on(PI.name == PIItem.parent)
-		.select(
-			PI.name,
-			PI.posting_date,
-			PI.currency,
-			PI.conversion_rate,
-			PI.supplier,
-			PI.company,
-			PIItem.base_net_rate,
-			PIItem.conversion_factor
-		)
-		.where(
-			(PIItem.item_code == item_code)
-			& (PI.docstatus == 1)
-		)
-		.orderby(PI.posting_date, order=Order.desc)
-		.orderby(PI.creation, order=Order.desc)
-		.limit(1)
+def _get_item_lcv_row(item_code, receipt_document_type=None, receipt_document=None):
+	"""
+	Latest submitted Landed Cost Item line of the item, optionally only the
+	lines booked against one receipt document. Returns None if there is none.
+	"""
+	conditions = ["LCI.item_code = %(item_code)s", "LCV.docstatus = 1"]
+	if receipt_document:
+		conditions += [
+			"LCI.receipt_document_type = %(receipt_document_type)s",
+			"LCI.receipt_document = %(receipt_document)s",
+		]
+
+	result = frappe.db.sql(
+		f"""
+		SELECT LCI.receipt_document_type, LCI.receipt_document, LCI.applicable_charges, LCV.name AS lcv_name
+		FROM `tabLanded Cost Voucher` LCV
+		INNER JOIN `tabLanded Cost Item` LCI ON LCV.name = LCI.parent
+		WHERE {" AND ".join(conditions)}
+		ORDER BY LCV.posting_date DESC, LCV.creation DESC, LCI.idx
+		LIMIT 1
+		""",
+		{"item_code": item_code, "receipt_document_type": receipt_document_type, "receipt_document": receipt_document},
+		as_dict=True,
 	)
-	
-	result = query.run(as_dict=True)
 	return result[0] if result else None
 
 
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""
+Short-lived per-item Redis locks for Item Price refreshes.
+
+Refresh jobs from different hooks may pick up the same item at once. Each job
+locks the items it is about to recompute and skips the ones another job holds
+instead of waiting; the caller re-queues those. Locks expire on their own, so a
+crashed worker never blocks an item for longer than the TTL.
+"""
+
+from __future__ import annotations
+
+import frappe
+from frappe.utils import cint
+
+_LOCK_KEY = "apex_item:item_price_lock"
+_LOCK_TTL_SECONDS = 60
+
+# Delete the key only if it still holds our token, so an expired lock that was
+# taken over by another job is left alone
+_RELEASE_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+	return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
+def acquire_item_locks(item_codes) -> dict[str, str]:
+	"""Lock every free item; return {item_code: token} for the locks taken."""
+	item_codes = sorted({item_code for item_code in item_codes or [] if item_code})
+	if not item_codes:
+		return {}
+
+	token = frappe.generate_hash(length=16)
+	ttl = cint(frappe.conf.get("apex_item_item_lock_ttl")) or _LOCK_TTL_SECONDS
+	try:
+		cache = frappe.cache()
+		pipe = cache.pipeline()
+		for item_code in item_codes:
+			pipe.set(_get_lock_key(cache, item_code), token, nx=True, ex=ttl)
+		results = pipe.execute()
+	except Exception:
+		# Without Redis, refresh unlocked rather than not at all
+		return {item_code: None for item_code in item_codes}
+
+	return {item_code: token for item_code, acquired in zip(item_codes, results, strict=True) if acquired}
+
+
+def release_item_locks(tokens: dict[str, str]) -> None:
+	tokens = {item_code: token for item_code, token in (tokens or {}).items() if token}
+	if not tokens:
+		return
+
+	try:
+		cache = frappe.cache()
+		pipe = cache.pipeline()
+		for item_code, token in tokens.items():
+			pipe.eval(_RELEASE_SCRIPT, 1, _get_lock_key(cache, item_code), token)
+		pipe.execute()
+	except Exception:
+		frappe.log_error(frappe.get_traceback(), "Apex Item: Release Item Locks")
+
+
+def _get_lock_key(cache, item_code) -> str:
+	return cache.make_key(f"{_LOCK_KEY}:{item_code}")
@@ -1,15 +1,117 @@
 # -*- coding: utf-8 -*-
 # Item Price Hooks - Auto-calculate available quantity
 
-import frappe
-from functools import lru_cache
+import hashlib
+import json
+import time
+from functools import partial
 from typing import Iterable, Optional
 
-from frappe.utils import flt
+import frappe
+from frappe.utils import add_to_date, cint, flt, get_datetime, now_datetime
+from frappe.utils.background_jobs import is_job_enqueued
+
+from apex_item.app_state import get_app_state, set_app_state
+from apex_item.bulk_write import bulk_update_values
+from apex_item.item_locks import acquire_item_locks, release_item_locks
+from apex_item.open_purchase_qty import get_open_purchase_qty_rows
+from apex_item.warehouse_tree import get_warehouse_ancestors, get_warehouse_descendants
+
+# Item codes per grouped snapshot query; keeps IN lists and result sets bounded
+_SNAPSHOT_CHUNK_SIZE = 500
+
+# Stored Item Price columns compared against a new snapshot before writing
+_STOCK_QTY_FIELDS = ("actual_qty", "available_qty", "reserved_qty", "waiting_qty")
+_STOCK_FIELDS = (*_STOCK_QTY_FIELDS, "item_group", "item_image", "stock_warehouse")
+
+# When and by which path a row's stock fields were last computed. Rows whose values
+# did not move only get a new timestamp once it is older than the touch interval.
+_SYNC_FIELDS = ("stock_synced_at", "stock_sync_source")
+_SYNC_TOUCH_INTERVAL_SECONDS = 10 * 60
+
+# Per-item Redis hashes of {warehouse: snapshot}, invalidated by the stock hooks
+_SNAPSHOT_CACHE_KEY = "apex_item:stock_snapshot"
+_SNAPSHOT_CACHE_HITS_KEY = "apex_item:stock_snapshot_hits"
+_SNAPSHOT_CACHE_MISSES_KEY = "apex_item:stock_snapshot_misses"
+_SNAPSHOT_CACHE_TTL = 300
+
+# frappe.local attribute holding the per-transaction {(item_code, warehouse): snapshot} memo
+_SNAPSHOT_MEMO_ATTR = "apex_item_snapshot_memo"
+
+# frappe.local attribute holding the (item_code, warehouse) pairs touched by the
+# current transaction; dispatched as one refresh after commit, dropped on rollback
+_PENDING_REFRESH_PAIRS_ATTR = "apex_item_pending_refresh_pairs"
+
+# frappe.local attribute holding {(item_code, warehouse): summed ledger qty} of the
+# current transaction in stock delta mode; applied in before_commit
+_PENDING_STOCK_DELTAS_ATTR = "apex_item_pending_stock_deltas"
+
+# Site-scoped Redis hash of {item_code: default warehouse}
+_DEFAULT_WAREHOUSE_CACHE_KEY = "apex_item:item_default_warehouse"
+_DEFAULT_WAREHOUSE_CACHE_TTL = 24 * 60 * 60
+
+# Coalescing refresh queue: hooks add pairs to a Redis set drained by one job
+_DIRTY_SET_KEY = "apex_item:item_price_dirty"
+_DRAIN_JOB_ID = "apex_item_item_price_drain"
+_DRAIN_BATCH_SIZE = 500
+_DRAIN_MAX_ROUNDS = 50
+_DRAIN_DEBOUNCE_SECONDS = 2
+
+# Scheduled reconcile pages through Bin changes from a persisted (modified, name) cursor
+_RECONCILE_CURSOR_KEY = "apex_item_bin_reconcile_cursor"
+_RECONCILE_BATCH_SIZE = 500
+_RECONCILE_MAX_BATCHES = 200
+_RECONCILE_INITIAL_LOOKBACK_MINUTES = 15
+# Bin.modified is set when a row is written, not when its transaction commits, so
+# the reconcile only reads Bins older than the longest expected stock transaction
+_RECONCILE_GRACE_MINUTES = 15
+
+# Rows the reconcile had to repair while stock delta mode is on
+_STOCK_DELTA_DRIFT_KEY = "stock_delta_drift"
+
+# Vouchers whose ledger entries can also release or consume Bin reservations
+# (sales orders, production and subcontracting); they get a full refresh even in
+# stock delta mode, since a delta only moves actual and available quantities
+_RESERVATION_VOUCHER_TYPES = ("Delivery Note", "Sales Invoice", "Subcontracting Receipt")
+_RESERVATION_STOCK_ENTRY_PURPOSES = (
+	"Material Transfer for Manufacture",
+	"Material Consumption for Manufacture",
+	"Manufacture",
+	"Send to Subcontractor",
+)
+
+# Realtime event (Item Price doctype room) carrying per-row stock diffs after a write
+_STOCK_DIFF_EVENT = "apex_item_item_price_stock"
+_STOCK_DIFF_CHUNK_SIZE = 500
+
+# Upper bound on rows per read-only live snapshot request (one list page)
+_LIVE_SNAPSHOT_MAX_ROWS = 500
+
+# Status of background refreshes started from the list view, keyed by job id
+_REFRESH_JOB_STATUS_KEY = "apex_item:item_price_refresh_job"
+_REFRESH_JOB_STATUS_TTL = 60 * 60
 
 
 def set_stock_fields(doc, method=None):
 	"""Calculate and set available/reserved quantities for the item price"""
+	_apply_current_snapshot(doc)
+	if doc.item_code and doc.meta.has_field("stock_synced_at"):
+		doc.stock_synced_at = now_datetime()
+		doc.stock_sync_source = "save"
+
+
+def update_available_qty_on_save(doc, method=None):
+	"""
+	Update available/reserved fields in database after save. The snapshot is
+	memoized from before_save, so this only writes if stock moved in between.
+	"""
+	if doc.item_code:
+		stored = _get_stored_stock_values(doc)
+		_apply_current_snapshot(doc)
+		_update_item_price_row(doc.name, doc, stored=stored, source="save")
+
+
+def _apply_current_snapshot(doc):
 	if not doc.item_code:
 		_apply_snapshot_to_doc(doc, _empty_snapshot())
 		return
@@ -17,17 +119,44 @@ def set_stock_fields(doc, method=None):
 	if warehouse and not getattr(doc, "stock_warehouse", None):
 		doc.stock_warehouse = warehouse
 
-	snapshot = _get_stock_snapshot(doc.item_code, warehouse)
-	_apply_snapshot_to_doc(doc, snapshot)
+	_apply_snapshot_to_doc(doc, _get_memoized_stock_snapshot(doc.item_code, warehouse))
 
 
-def update_available_qty_on_save(doc, method=None):
+def _get_memoized_stock_snapshot(item_code, warehouse=None) -> dict:
 	"""
-	Update available/reserved fields in database after save
+	Snapshot shared by every hook of the current transaction. One save runs
+	before_insert/before_save and after_insert/on_update; they all reuse the
+	first result until commit, rollback or a stock hook invalidates the item.
 	"""
-	if doc.item_code:
-		set_stock_fields(doc, method)
-		_update_item_price_row(doc.name, doc)
+	memo = _get_snapshot_memo()
+	key = (item_code, warehouse or None)
+	if key not in memo:
+		memo[key] = _get_stock_snapshot(item_code, warehouse)
+	return dict(memo[key])
+
+
+def _get_snapshot_memo() -> dict:
+	memo = getattr(frappe.local, _SNAPSHOT_MEMO_ATTR, None)
+	if memo is None:
+		memo = {}
+		setattr(frappe.local, _SNAPSHOT_MEMO_ATTR, memo)
+		frappe.db.after_commit.add(_clear_snapshot_memo)
+		frappe.db.after_rollback.add(_clear_snapshot_memo)
+	return memo
+
+
+def _discard_memoized_snapshots(item_codes) -> None:
+	memo = getattr(frappe.local, _SNAPSHOT_MEMO_ATTR, None)
+	if not memo:
+		return
+	item_codes = set(item_codes)
+	for key in [key for key in memo if key[0] in item_codes]:
+		memo.pop(key)
+
+
+def _clear_snapshot_memo():
+	if hasattr(frappe.local, _SNAPSHOT_MEMO_ATTR):
+		delattr(frappe.local, _SNAPSHOT_MEMO_ATTR)
 
 
 def update_item_prices_for_item(item_code, target_warehouse=None):
@@ -35,41 +164,7 @@ def update_item_prices_for_item(item_code, target_warehouse=None):
 	if not item_code:
 		return
 
-	item_prices = frappe.db.get_all(
-		"Item Price",
-		filters={"item_code": item_code},
-		fields=["name", "stock_warehouse"],
-	)
-	if not item_prices:
-		return
-
-	# Defer resolving fallback warehouse until needed to avoid errors on sites
-	# where Item.default_warehouse column may not exist.
-	fallback_warehouse = None
-	snapshots: dict[str | None, dict] = {}
-
-	for row in item_prices:
-		# Resolve fallback lazily only if the row has no explicit warehouse
-		if not row.stock_warehouse and fallback_warehouse is None:
-			try:
-				fallback_warehouse = _get_item_default_warehouse(item_code)
-			except Exception:
-				# If unavailable (e.g. missing column), keep None and proceed with all-warehouses snapshot
-				fallback_warehouse = None
-
-		row_warehouse = row.stock_warehouse or fallback_warehouse
-		if target_warehouse and row_warehouse and row_warehouse != target_warehouse:
-			continue
-
-		snapshot_key = row_warehouse or "__all__"
-		if snapshot_key not in snapshots:
-			snapshots[snapshot_key] = _get_stock_snapshot(item_code, row_warehouse)
-
-		extra_values = {}
-		if not row.stock_warehouse and row_warehouse:
-			extra_values["stock_warehouse"] = row_warehouse
-
-		_update_item_price_row(row.name, snapshots[snapshot_key], extra_values)
+	refresh_item_prices_for_items([(item_code, target_warehouse)])
 
 
 def update_item_price_from_bin(doc, method=None):
@@ -77,18 +172,132 @@ def update_item_price_from_bin(doc, method=None):
 	item_code = getattr(doc, "item_code", None)
 	if not item_code:
 		return
-	_enqueue_item_price_refresh(
-		[{"item_code": item_code, "warehouse": getattr(doc, "warehouse", None)}]
-	)
+	pair = (item_code, getattr(doc, "warehouse", None))
+	# Already covered by a ledger delta of this transaction
+	if pair in (getattr(frappe.local, _PENDING_STOCK_DELTAS_ATTR, None) or {}):
+		return
+	_enqueue_item_price_refresh([pair])
 
 
 def update_item_prices_from_stock_ledger(doc, method=None):
 	item_code = getattr(doc, "item_code", None)
 	if not item_code:
 		return
-	_enqueue_item_price_refresh(
-		[{"item_code": item_code, "warehouse": getattr(doc, "warehouse", None)}]
-	)
+	pair = (item_code, getattr(doc, "warehouse", None))
+	actual_qty = flt(getattr(doc, "actual_qty", 0))
+	# Stock Reconciliation entries carry the new balance in qty_after_transaction and
+	# no actual_qty when submitted, so they (and any zero-qty entry) get a full refresh,
+	# as do vouchers that also move reserved quantities
+	if (
+		pair[1]
+		and actual_qty
+		and doc.get("voucher_type") != "Stock Reconciliation"
+		and is_stock_delta_mode()
+		and not _moves_reservations(doc)
+	):
+		sign = -1 if method == "on_cancel" else 1
+		_add_pending_stock_delta(pair, sign * actual_qty)
+		return
+	_enqueue_item_price_refresh([pair])
+
+
+def is_stock_delta_mode() -> bool:
+	"""Incremental stock updates from ledger quantities; enable with `apex_item_stock_delta_mode` in site_config.json."""
+	return bool(cint(frappe.conf.get("apex_item_stock_delta_mode")))
+
+
+def _moves_reservations(doc) -> bool:
+	"""True if the ledger entry's voucher can also change reserved quantities in Bin."""
+	voucher_type = doc.get("voucher_type")
+	if voucher_type == "Stock Entry":
+		entry = frappe.db.get_value(
+			"Stock Entry",
+			doc.get("voucher_no"),
+			["purpose", "work_order", "subcontracting_order"],
+			as_dict=True,
+			cache=True,
+		)
+		return bool(
+			entry
+			and (entry.purpose in _RESERVATION_STOCK_ENTRY_PURPOSES or entry.work_order or entry.subcontracting_order)
+		)
+	return voucher_type in _RESERVATION_VOUCHER_TYPES
+
+
+def _add_pending_stock_delta(pair, delta):
+	"""
+	Sum ledger quantity changes per (item_code, warehouse) for the current
+	transaction. They are applied just before it commits, in the same
+	transaction as the ledger entries, so a rollback undoes both.
+	"""
+	deltas = getattr(frappe.local, _PENDING_STOCK_DELTAS_ATTR, None)
+	if deltas is None:
+		deltas = {}
+		setattr(frappe.local, _PENDING_STOCK_DELTAS_ATTR, deltas)
+		frappe.db.before_commit.add(_apply_pending_stock_deltas)
+		frappe.db.after_rollback.add(_discard_pending_stock_deltas)
+
+	if pair not in deltas:
+		# Cleared now as well as after commit: readers in between (and after a
+		# rollback) must not keep serving the snapshot from before this movement
+		invalidate_stock_snapshot_cache([pair[0]])
+	deltas[pair] = deltas.get(pair, 0) + delta
+	_discard_memoized_snapshots([pair[0]])
+
+
+def _apply_pending_stock_deltas():
+	"""
+	Add each pending delta to actual_qty and available_qty of the Item Price
+	rows scoped to that warehouse, or to a group warehouse above it, with one
+	UPDATE per pair. Rows without a stock_warehouse follow the item's default
+	warehouse (or a group warehouse above the moved one), or every warehouse if
+	it has none. Reserved and waiting quantities do not move with the ledger;
+	vouchers that change reservations are refreshed in full instead.
+	The scheduled Bin reconcile recomputes these pairs in full and repairs drift.
+	"""
+	deltas = getattr(frappe.local, _PENDING_STOCK_DELTAS_ATTR, None) or {}
+	_discard_pending_stock_deltas()
+	deltas = {pair: delta for pair, delta in deltas.items() if abs(delta) > 1e-9}
+	if not deltas:
+		return
+
+	item_codes = {item_code for item_code, _warehouse in deltas}
+	default_warehouses = _get_item_default_warehouses(item_codes)
+
+	ancestors = get_warehouse_ancestors({warehouse for _item_code, warehouse in deltas})
+
+	diffs = {}
+	for (item_code, warehouse), delta in deltas.items():
+		# The warehouse itself and every group warehouse above it
+		warehouses = tuple(ancestors.get(warehouse) or (warehouse,))
+		conditions = ["stock_warehouse IN %(warehouses)s"]
+		default_warehouse = default_warehouses.get(item_code)
+		if default_warehouse is None or default_warehouse in warehouses:
+			conditions.append("IFNULL(stock_warehouse, '') = ''")
+		where = f"item_code = %(item_code)s AND ({' OR '.join(conditions)})"
+		params = {"item_code": item_code, "warehouses": warehouses, "delta": delta}
+
+		frappe.db.sql(
+			f"""
+			UPDATE `tabItem Price`
+			SET actual_qty = IFNULL(actual_qty, 0) + %(delta)s,
+				available_qty = IFNULL(available_qty, 0) + %(delta)s
+			WHERE {where}
+			""",
+			params,
+		)
+		for row in frappe.db.sql(
+			f"SELECT name, actual_qty, available_qty FROM `tabItem Price` WHERE {where}", params, as_dict=True
+		):
+			diffs[row.name] = {"actual_qty": row.actual_qty, "available_qty": row.available_qty}
+
+	publish_stock_diffs(diffs)
+	frappe.db.after_commit.add(partial(invalidate_stock_snapshot_cache, item_codes))
+
+
+def _discard_pending_stock_deltas():
+	if hasattr(frappe.local, _PENDING_STOCK_DELTAS_ATTR):
+		delattr(frappe.local, _PENDING_STOCK_DELTAS_ATTR)
 
 
 def update_item_prices_from_sales_order(doc, method=None):
@@ -103,93 +312,232 @@ def update_item_prices_from_purchase_receipt(doc, method=None):
 	_enqueue_item_price_refresh(_collect_item_warehouse_pairs(doc, "items"))
 
 
-def _get_stock_snapshot(item_code, warehouse=None):
-	snapshot = _empty_snapshot()
+def _get_stock_snapshot(item_code, warehouse=None, use_cache: bool = False):
 	if not item_code:
-		return snapshot
+		return _empty_snapshot()
 
-	try:
-		bin_conditions = ["item_code = %s"]
-		bin_params = [item_code]
-		if warehouse:
-			bin_conditions.append("warehouse = %s")
-			bin_params.append(warehouse)
+	return _get_stock_snapshots([(item_code, warehouse)], use_cache=use_cache)[(item_code, warehouse)]
 
-		stock_data = frappe.db.sql(
-			"""
-			SELECT 
-				SUM(actual_qty) as actual_qty,
-				SUM(reserved_qty + reserved_qty_for_production + reserved_qty_for_sub_contract) as reserved_qty
-			FROM `tabBin`
-			WHERE {conditions}
-		""".format(
-				conditions=" AND ".join(bin_conditions)
-			),
-			tuple(bin_params),
-			as_dict=True,
-		)
 
-		waiting_conditions = [
-			"POI.item_code = %s",
-			"PO.docstatus = 1",
-			"POI.qty > POI.received_qty",
-		]
-		waiting_params = [item_code]
-		if warehouse:
-			waiting_conditions.append("POI.warehouse = %s")
-			waiting_params.append(warehouse)
-
-		waiting_data = frappe.db.sql(
-			"""
-			SELECT SUM(POI.qty - POI.received_qty) AS waiting
-			FROM `tabPurchase Order Item` POI
-			INNER JOIN `tabPurchase Order` PO ON PO.name = POI.parent
-			WHERE {conditions}
-		""".format(
-				conditions=" AND ".join(waiting_conditions)
-			),
-			tuple(waiting_params),
-			as_dict=True,
-		)
+def _get_stock_snapshots(
+	item_pairs: Iterable[dict | tuple | list], use_cache: bool = False, failed: set | None = None
+) -> dict[tuple, dict]:
+	"""
+	Return {(item_code, warehouse): snapshot} for many pairs at once.
+
+	Bin, open Purchase Order and Item data are read with one grouped query each
+	per chunk of item codes, instead of three queries per pair. A warehouse of
+	None aggregates across all warehouses of the item; a group warehouse
+	aggregates across the leaf warehouses below it.
+
+	With `use_cache`, snapshots are served from and stored in the site's Redis
+	snapshot cache, which the stock hooks invalidate per item.
+
+	Pairs of a chunk whose queries fail keep an empty snapshot; pass a set as
+	`failed` to collect them, so writers can skip them instead of storing zeros.
+	"""
+	pairs = list(_deduplicate_pairs(item_pairs or []))
+	snapshots = {pair: _empty_snapshot() for pair in pairs}
+	if not pairs:
+		return snapshots
+
+	missing = pairs
+	if use_cache:
+		cached = _read_cached_snapshots(pairs)
+		snapshots.update(cached)
+		missing = [pair for pair in pairs if pair not in cached]
+
+	computed = []
+	item_codes = sorted({item_code for item_code, _warehouse in missing})
+	for start in range(0, len(item_codes), _SNAPSHOT_CHUNK_SIZE):
+		chunk = set(item_codes[start : start + _SNAPSHOT_CHUNK_SIZE])
+		chunk_pairs = [pair for pair in missing if pair[0] in chunk]
+		try:
+			_fill_stock_snapshots(snapshots, chunk, chunk_pairs)
+			computed.extend(chunk_pairs)
+		except Exception as e:
+			if failed is not None:
+				failed.update(chunk_pairs)
+			frappe.log_error(
+				f"Error calculating stock fields for {len(chunk)} item(s): {e!s}",
+				"Item Price - Stock Calculation",
+			)
+
+	if use_cache and computed:
+		_write_cached_snapshots({pair: snapshots[pair] for pair in computed})
+
+	return snapshots
 
-		item_data = frappe.db.get_value(
-			"Item",
+
+def _fill_stock_snapshots(snapshots, item_codes, pairs):
+	warehouses = {warehouse or None for _item_code, warehouse in pairs}
+	# Group warehouses cover the leaf warehouses inside their lft/rgt range
+	scopes = get_warehouse_descendants(warehouses - {None})
+	params = {"item_codes": tuple(item_codes)}
+	bin_conditions = ["item_code IN %(item_codes)s"]
+	# Only narrow by warehouse when no pair asks for the all-warehouses total
+	narrow_warehouses = None
+	if None not in warehouses:
+		narrow_warehouses = {leaf for leaves in scopes.values() for leaf in leaves}
+		params["warehouses"] = tuple(narrow_warehouses) or ("",)
+		bin_conditions.append("warehouse IN %(warehouses)s")
+
+	stock_rows = frappe.db.sql(
+		"""
+		SELECT
 			item_code,
-			["item_group", "image", "website_image", "thumbnail"],
-			as_dict=True,
-		)
+			warehouse,
+			SUM(actual_qty) as actual_qty,
+			SUM(reserved_qty + reserved_qty_for_production + reserved_qty_for_sub_contract) as reserved_qty
+		FROM `tabBin`
+		WHERE {conditions}
+		GROUP BY item_code, warehouse
+	""".format(
+			conditions=" AND ".join(bin_conditions)
+		),
+		params,
+		as_dict=True,
+	)
 
-		if stock_data and stock_data[0]:
-			actual = flt(stock_data[0].get("actual_qty", 0))
-			reserved = flt(stock_data[0].get("reserved_qty", 0))
-			available = actual - reserved
-		else:
-			actual = reserved = available = 0
+	waiting_rows = get_open_purchase_qty_rows(item_codes, params.get("warehouses"))
+
+	item_rows = frappe.db.get_all(
+		"Item",
+		filters={"name": ("in", list(item_codes))},
+		fields=["name", "item_group", "image", "website_image", "thumbnail"],
+	)
+
+	stock = _sum_by_pair(stock_rows, ("actual_qty", "reserved_qty"))
+	waiting = _sum_by_pair(waiting_rows, ("waiting",))
+	items = {row.name: row for row in item_rows}
 
-		waiting = flt(waiting_data[0].get("waiting", 0)) if waiting_data and waiting_data[0] else 0
+	for pair in pairs:
+		item_code = pair[0]
+		actual = reserved = waiting_qty = 0
+		for leaf in scopes.get(pair[1], ()) if pair[1] else (None,):
+			leaf_actual, leaf_reserved = stock.get((item_code, leaf), (0, 0))
+			actual += leaf_actual
+			reserved += leaf_reserved
+			waiting_qty += waiting.get((item_code, leaf), (0,))[0]
+		item_data = items.get(item_code)
 
 		item_group = item_data.get("item_group") if item_data else None
 		item_image = None
 		if item_data:
 			item_image = item_data.get("image") or item_data.get("website_image") or item_data.get("thumbnail")
 
-		snapshot.update(
+		snapshots[pair].update(
 			{
 				"actual_qty": actual,
-				"available_qty": available,
+				"available_qty": actual - reserved,
 				"reserved_qty": reserved,
-				"waiting_qty": waiting,
+				"waiting_qty": waiting_qty,
 				"item_group": item_group,
 				"item_image": item_image,
 			}
 		)
-	except Exception as e:
-		frappe.log_error(
-			f"Error calculating stock fields for {item_code}: {str(e)}",
-			"Item Price - Stock Calculation",
-		)
 
-	return snapshot
+
+def _sum_by_pair(rows, fieldnames):
+	"""Index grouped rows by (item_code, warehouse) and by (item_code, None) totals."""
+	totals: dict[tuple, tuple] = {}
+	for row in rows or []:
+		values = tuple(flt(row.get(fieldname)) for fieldname in fieldnames)
+		keys = {(row.item_code, row.warehouse or None), (row.item_code, None)}
+		for key in keys:
+			current = totals.get(key)
+			totals[key] = values if current is None else tuple(a + b for a, b in zip(current, values, strict=True))
+	return totals
+
+
+def invalidate_stock_snapshot_cache(item_codes) -> None:
+	"""Drop cached and memoized snapshots (every warehouse) for the given item codes."""
+	item_codes = {item_code for item_code in item_codes or [] if item_code}
+	if not item_codes:
+		return
+
+	_discard_memoized_snapshots(item_codes)
+
+	try:
+		cache = frappe.cache()
+		pipe = cache.pipeline()
+		for item_code in item_codes:
+			pipe.delete(_get_snapshot_cache_key(cache, item_code))
+		pipe.execute()
+	except Exception:
+		frappe.log_error(frappe.get_traceback(), "Apex Item: Invalidate Stock Snapshot Cache")
+
+
+@frappe.whitelist()
+def get_stock_snapshot_cache_stats(reset: bool = False) -> dict:
+	"""Return hit/miss counters of the stock snapshot cache for this site."""
+	frappe.only_for("System Manager")
+
+	cache = frappe.cache()
+	keys = [cache.make_key(_SNAPSHOT_CACHE_HITS_KEY), cache.make_key(_SNAPSHOT_CACHE_MISSES_KEY)]
+	pipe = cache.pipeline()
+	for key in keys:
+		pipe.get(key)
+	if cint(reset):
+		pipe.delete(*keys)
+	hits, misses = (cint(value) for value in pipe.execute()[:2])
+
+	lookups = hits + misses
+	return {
+		"hits": hits,
+		"misses": misses,
+		"hit_ratio": flt(hits / lookups, 4) if lookups else 0,
+		"ttl": _get_snapshot_cache_ttl(),
+	}
+
+
+def _read_cached_snapshots(pairs) -> dict[tuple, dict]:
+	try:
+		cache = frappe.cache()
+		pipe = cache.pipeline()
+		for item_code, warehouse in pairs:
+			pipe.hget(_get_snapshot_cache_key(cache, item_code), warehouse or "__all__")
+		entries = pipe.execute()
+
+		hits = {}
+		fresh_after = time.time() - _get_snapshot_cache_ttl()
+		for pair, raw in zip(pairs, entries, strict=True):
+			if not raw:
+				continue
+			entry = json.loads(raw)
+			if flt(entry.get("at")) >= fresh_after:
+				hits[pair] = entry["snapshot"]
+
+		pipe.incrby(cache.make_key(_SNAPSHOT_CACHE_HITS_KEY), len(hits))
+		pipe.incrby(cache.make_key(_SNAPSHOT_CACHE_MISSES_KEY), len(pairs) - len(hits))
+		pipe.execute()
+		return hits
+	except Exception:
+		# The cache is an optimisation only; fall back to the database
+		return {}
+
+
+def _write_cached_snapshots(snapshots) -> None:
+	try:
+		cache = frappe.cache()
+		ttl = _get_snapshot_cache_ttl()
+		now = time.time()
+		pipe = cache.pipeline()
+		for (item_code, warehouse), snapshot in snapshots.items():
+			key = _get_snapshot_cache_key(cache, item_code)
+			pipe.hset(key, warehouse or "__all__", json.dumps({"at": now, "snapshot": snapshot}))
+			pipe.expire(key, ttl)
+		pipe.execute()
+	except Exception:
+		pass
+
+
+def _get_snapshot_cache_key(cache, item_code) -> str:
+	return cache.make_key(f"{_SNAPSHOT_CACHE_KEY}:{item_code}")
+
+
+def _get_snapshot_cache_ttl() -> int:
+	return cint(frappe.conf.get("apex_item_stock_cache_ttl")) or _SNAPSHOT_CACHE_TTL
 
 
 def _apply_snapshot_to_doc(doc, snapshot):
@@ -201,9 +549,15 @@ def _apply_snapshot_to_doc(doc, snapshot):
 	doc.item_image = snapshot["item_image"]
 
 
-def _update_item_price_row(name, doc_or_snapshot, extra_values=None):
+def _update_item_price_row(name, doc_or_snapshot, extra_values=None, stored=None, source=None) -> bool:
+	"""
+	Persist stock fields for one Item Price row. When the currently stored
+	values are passed in `stored` and nothing changed, the UPDATE is skipped
+	unless the row's sync timestamp is due for a touch.
+	Returns True if stock values were written.
+	"""
 	if isinstance(doc_or_snapshot, dict):
-		payload = doc_or_snapshot
+		payload = dict(doc_or_snapshot)
 	else:
 		payload = {
 			"available_qty": getattr(doc_or_snapshot, "available_qty", 0),
@@ -217,12 +571,88 @@ def _update_item_price_row(name, doc_or_snapshot, extra_values=None):
 	if extra_values:
 		payload.update(extra_values)
 
+	# Optional columns (e.g. item_image) may be missing on older sites
+	columns = set(frappe.db.get_table_columns("Item Price"))
+	payload = {fieldname: value for fieldname, value in payload.items() if fieldname in columns}
+
+	changed = _get_changed_stock_fields(stored, payload) if stored is not None else payload
+	if not changed:
+		if not _is_sync_touch_due(stored, columns):
+			return False
+		payload = {}
+
+	payload.update(_get_sync_stamp(source, columns))
+	if not payload:
+		return False
+
 	frappe.db.set_value(
 		"Item Price",
 		name,
 		payload,
 		update_modified=False,
 	)
+	publish_stock_diffs({name: changed})
+	return bool(changed)
+
+
+def _get_stored_stock_values(doc) -> dict:
+	return {fieldname: doc.get(fieldname) for fieldname in (*_STOCK_FIELDS, *_SYNC_FIELDS)}
+
+
+def _get_sync_stamp(source, columns, synced_at=None) -> dict:
+	stamp = {"stock_synced_at": synced_at or now_datetime(), "stock_sync_source": source or "manual"}
+	return {fieldname: value for fieldname, value in stamp.items() if fieldname in columns}
+
+
+def _is_sync_touch_due(stored, columns, now=None) -> bool:
+	"""True if an unchanged row's sync timestamp is missing or older than the touch interval."""
+	if "stock_synced_at" not in columns or stored is None:
+		return False
+	synced_at = stored.get("stock_synced_at")
+	if not synced_at:
+		return True
+	interval = cint(frappe.conf.get("apex_item_sync_touch_interval")) or _SYNC_TOUCH_INTERVAL_SECONDS
+	return get_datetime(synced_at) < add_to_date(now or now_datetime(), seconds=-interval)
+
+
+def _get_changed_stock_fields(stored, payload) -> dict:
+	"""Return the payload fields whose value differs from the stored row."""
+	changed = {}
+	for fieldname, value in payload.items():
+		if fieldname not in stored:
+			changed[fieldname] = value
+			continue
+		current = stored.get(fieldname)
+		if fieldname in _STOCK_QTY_FIELDS:
+			if abs(flt(current) - flt(value)) < 1e-9:
+				continue
+		elif (current or None) == (value or None):
+			continue
+		changed[fieldname] = value
+	return changed
+
+
+def publish_stock_diffs(diffs) -> None:
+	"""
+	Push {name: changed stock fields} to open Item Price list views once the
+	current transaction commits. Rolled back writes are never announced.
+	"""
+	diffs = {name: _compact_stock_diff(changed) for name, changed in (diffs or {}).items() if changed}
+	names = list(diffs)
+	for start in range(0, len(names), _STOCK_DIFF_CHUNK_SIZE):
+		frappe.publish_realtime(
+			_STOCK_DIFF_EVENT,
+			{"rows": {name: diffs[name] for name in names[start : start + _STOCK_DIFF_CHUNK_SIZE]}},
+			doctype="Item Price",
+			after_commit=True,
+		)
+
+
+def _compact_stock_diff(changed) -> dict:
+	return {
+		fieldname: flt(value, 6) if fieldname in _STOCK_QTY_FIELDS else value
+		for fieldname, value in changed.items()
+	}
 
 
 def _empty_snapshot():
@@ -236,29 +666,98 @@ def _empty_snapshot():
 	}
 
 
-@lru_cache(maxsize=None)
 def _get_item_default_warehouse(item_code):
 	if not item_code:
 		return None
 
+	return _get_item_default_warehouses([item_code]).get(item_code)
+
+
+def _get_item_default_warehouses(item_codes) -> dict[str, str | None]:
+	"""
+	Resolve the default warehouse of many items at once.
+
+	Results live in a site-scoped Redis hash shared by all workers (so worker
+	memory does not grow with the catalogue) and are dropped by the Item
+	on_update hook. Misses are resolved with one query on Item and one on
+	Item Default.
+	"""
+	item_codes = list(dict.fromkeys(item_code for item_code in item_codes or [] if item_code))
+	if not item_codes:
+		return {}
+
+	warehouses = _read_cached_default_warehouses(item_codes)
+	missing = [item_code for item_code in item_codes if item_code not in warehouses]
+	if not missing:
+		return warehouses
+
+	resolved = dict.fromkeys(missing)
+
 	# Some sites may not have Item.default_warehouse column; guard defensively
 	try:
 		if hasattr(frappe.db, "has_column") and frappe.db.has_column("Item", "default_warehouse"):
-			warehouse = frappe.db.get_value("Item", item_code, "default_warehouse")
-		else:
-			warehouse = None
+			for row in frappe.db.get_all(
+				"Item",
+				filters={"name": ("in", missing), "default_warehouse": ("is", "set")},
+				fields=["name", "default_warehouse"],
+			):
+				resolved[row.name] = row.default_warehouse
 	except Exception:
-		warehouse = None
+		pass
+
+	unresolved = [item_code for item_code, warehouse in resolved.items() if not warehouse]
+	if unresolved:
+		for row in frappe.db.get_all(
+			"Item Default",
+			filters={"parent": ("in", unresolved), "default_warehouse": ("is", "set")},
+			fields=["parent", "default_warehouse"],
+			order_by="idx asc",
+		):
+			if not resolved.get(row.parent):
+				resolved[row.parent] = row.default_warehouse
+
+	_write_cached_default_warehouses(resolved)
+	warehouses.update(resolved)
+	return warehouses
+
+
+def clear_item_default_warehouse_cache(doc, method=None):
+	"""Doc event helper: forget the cached default warehouse when an Item changes."""
+	if not getattr(doc, "name", None):
+		return
 
-	if warehouse:
-		return warehouse
+	try:
+		cache = frappe.cache()
+		cache.pipeline().hdel(cache.make_key(_DEFAULT_WAREHOUSE_CACHE_KEY), doc.name).execute()
+	except Exception:
+		frappe.log_error(frappe.get_traceback(), "Apex Item: Clear Default Warehouse Cache")
 
-	return frappe.db.get_value(
-		"Item Default",
-		{"parent": item_code},
-		"default_warehouse",
-		order_by="idx asc",
-	)
+
+def _read_cached_default_warehouses(item_codes) -> dict[str, str | None]:
+	try:
+		cache = frappe.cache()
+		values = cache.pipeline().hmget(cache.make_key(_DEFAULT_WAREHOUSE_CACHE_KEY), item_codes).execute()[0]
+	except Exception:
+		return {}
+
+	# Items without a default are cached as "" so they are not looked up again
+	return {
+		item_code: (value.decode() if isinstance(value, bytes) else value) or None
+		for item_code, value in zip(item_codes, values, strict=True)
+		if value is not None
+	}
+
+
+def _write_cached_default_warehouses(warehouses) -> None:
+	try:
+		cache = frappe.cache()
+		key = cache.make_key(_DEFAULT_WAREHOUSE_CACHE_KEY)
+		pipe = cache.pipeline()
+		pipe.hset(key, mapping={item_code: warehouse or "" for item_code, warehouse in warehouses.items()})
+		pipe.expire(key, _DEFAULT_WAREHOUSE_CACHE_TTL)
+		pipe.execute()
+	except Exception:
+		pass
 
 
 def _collect_item_warehouse_pairs(doc, child_table):
@@ -286,31 +785,292 @@ def _collect_item_warehouse_pairs(doc, child_table):
 	return pairs
 
 
-def refresh_item_prices_for_items(item_pairs: Optional[Iterable[dict]] = None):
-	if not item_pairs:
+def refresh_item_prices_for_items(
+	item_pairs: Optional[Iterable[dict]] = None, commit: bool = True, source: str = "event"
+):
+	"""Refresh every Item Price row affected by the given (item_code, warehouse) pairs."""
+	targets: dict[str, set] = {}
+	for item_code, warehouse in _deduplicate_pairs(item_pairs or []):
+		targets.setdefault(item_code, set()).add(warehouse)
+	if not targets:
+		return frappe._dict(written=0, skipped=0, fresh=0, locked=0, failed=0)
+
+	# A movement in a leaf warehouse also moves rows scoped to its group warehouses
+	ancestors = get_warehouse_ancestors({warehouse for warehouses in targets.values() for warehouse in warehouses})
+	for warehouses in targets.values():
+		warehouses.update(*(ancestors.get(warehouse, ()) for warehouse in list(warehouses) if warehouse))
+
+	rows = _resolve_row_warehouses(load_item_price_rows(item_codes=list(targets)))
+	rows = [row for row in rows if _row_matches_targets(row, targets.get(row.item_code) or set())]
+	return refresh_item_price_rows(rows, commit=commit, source=source)
+
+
+def load_item_price_rows(item_codes=None, names=None) -> list:
+	"""
+	Load the Item Price columns needed for a stock refresh, chunked by item code
+	or name. The stored stock columns are included so unchanged rows can be skipped.
+	"""
+	fieldname, values = ("item_code", item_codes) if item_codes is not None else ("name", names)
+	values = [value for value in (values or []) if value]
+
+	rows = []
+	for start in range(0, len(values), _SNAPSHOT_CHUNK_SIZE):
+		rows.extend(
+			frappe.db.get_all(
+				"Item Price",
+				filters={fieldname: ("in", values[start : start + _SNAPSHOT_CHUNK_SIZE])},
+				fields=get_item_price_row_fields(),
+			)
+		)
+	return rows
+
+
+def get_item_price_row_fields() -> list[str]:
+	"""Fields `refresh_item_price_rows` expects on each row."""
+	columns = set(frappe.db.get_table_columns("Item Price"))
+	return ["name", "item_code", *(fieldname for fieldname in (*_STOCK_FIELDS, *_SYNC_FIELDS) if fieldname in columns)]
+
+
+def refresh_item_price_rows(
+	rows,
+	commit: bool = False,
+	chunk_size: int | None = None,
+	max_staleness: int | None = None,
+	source: str = "manual",
+) -> frappe._dict:
+	"""
+	Recompute and persist stock fields for Item Price rows loaded by
+	`load_item_price_rows`. Snapshots for all rows come from one bulk lookup
+	against the Bins (never the snapshot cache, since they are written), rows whose stored values already match are skipped, and the rest are
+	written with chunked multi-row UPDATEs stamped with `stock_synced_at` and
+	`source`. With `max_staleness` (seconds), rows synced more recently than
+	that are skipped without computing a snapshot.
+
+	Items are locked for the duration of the refresh. Rows of items another
+	job is refreshing are not waited for; they are marked dirty again so the
+	drainer retries them, and counted as `locked`. Rows whose snapshot could not
+	be computed are not written either; they are marked dirty and counted as `failed`.
+	Returns {"written": int, "skipped": int, "fresh": int, "locked": int, "failed": int}.
+	"""
+	stats = frappe._dict(written=0, skipped=0, fresh=0, locked=0, failed=0)
+	rows = [row for row in rows or [] if row.get("item_code")]
+
+	now = now_datetime()
+	if cint(max_staleness) > 0:
+		fresh_after = add_to_date(now, seconds=-cint(max_staleness))
+		stale = [row for row in rows if not row.get("stock_synced_at") or get_datetime(row.stock_synced_at) < fresh_after]
+		stats.fresh = len(rows) - len(stale)
+		stats.skipped += stats.fresh
+		rows = stale
+
+	rows = _resolve_row_warehouses(rows)
+	if not rows:
+		return stats
+
+	locks = acquire_item_locks(row.item_code for row in rows)
+	held = [row for row in rows if row.item_code not in locks]
+	if held:
+		stats.locked = len(held)
+		mark_item_prices_dirty((row.item_code, row.row_warehouse) for row in held)
+		rows = [row for row in rows if row.item_code in locks]
+
+	try:
+		_refresh_locked_rows(rows, stats, commit, chunk_size, source, now)
+	finally:
+		if commit:
+			release_item_locks(locks)
+		else:
+			# The caller commits; keep the items locked until it does
+			frappe.db.after_commit.add(partial(release_item_locks, locks))
+			frappe.db.after_rollback.add(partial(release_item_locks, locks))
+	return stats
+
+
+def _refresh_locked_rows(rows, stats, commit, chunk_size, source, now):
+	if not rows:
 		return
 
-	for item_code, warehouse in _deduplicate_pairs(item_pairs):
-		update_item_prices_for_item(item_code, warehouse)
+	failed = set()
+	snapshots = _get_stock_snapshots(((row.item_code, row.row_warehouse) for row in rows), failed=failed)
+	if failed:
+		# Keep the stored values instead of overwriting them with zeros; retry later
+		retry = [row for row in rows if (row.item_code, row.row_warehouse) in failed]
+		stats.failed = len(retry)
+		mark_item_prices_dirty((row.item_code, row.row_warehouse) for row in retry)
+		rows = [row for row in rows if (row.item_code, row.row_warehouse) not in failed]
+
+	columns = set(frappe.db.get_table_columns("Item Price"))
+	stamp = _get_sync_stamp(source, columns, synced_at=now)
+
+	payloads = {}
+	diffs = {}
+	for row in rows:
+		payload = dict(snapshots[(row.item_code, row.row_warehouse)])
+		if not row.stock_warehouse and row.row_warehouse:
+			payload["stock_warehouse"] = row.row_warehouse
+		payload = {fieldname: value for fieldname, value in payload.items() if fieldname in columns}
+		changed = _get_changed_stock_fields(row, payload)
+		if not changed:
+			stats.skipped += 1
+			if _is_sync_touch_due(row, columns, now=now):
+				payloads[row.name] = dict(stamp)
+			continue
+		payloads[row.name] = {**payload, **stamp}
+		diffs[row.name] = changed
+
+	# Write errors propagate so callers can retry the pairs (the drainer puts its batch back)
+	bulk_update_values("Item Price", payloads, chunk_size=chunk_size, commit=commit)
+	stats.written = len(diffs)
+	publish_stock_diffs(diffs)
+
+
+def _resolve_row_warehouses(rows):
+	"""Set `row_warehouse` on each row, falling back to the item's default warehouse."""
+	pending = [row for row in rows if "row_warehouse" not in row]
+	fallback_items = [row.item_code for row in pending if not row.stock_warehouse]
+
+	fallback_warehouses: dict[str, str | None] = {}
+	if fallback_items:
+		try:
+			fallback_warehouses = _get_item_default_warehouses(fallback_items)
+		except Exception:
+			fallback_warehouses = {}
+
+	for row in pending:
+		row.row_warehouse = row.stock_warehouse or fallback_warehouses.get(row.item_code) or None
+	return rows
+
+
+def _row_matches_targets(row, target_warehouses):
+	if None in target_warehouses or not row.row_warehouse:
+		return True
+	return row.row_warehouse in target_warehouses
 
 
 def _enqueue_item_price_refresh(item_pairs):
+	"""
+	Schedule a refresh of the given (item_code, warehouse) pairs for when the
+	current transaction commits. Pairs from every hook of the transaction (all
+	Stock Ledger Entries of a voucher, the Bin updates they cause, order and
+	receipt items) are merged into one set and dispatched once, so workers
+	never read uncommitted stock. Nothing is scheduled if it rolls back.
+	"""
+	pending = getattr(frappe.local, _PENDING_REFRESH_PAIRS_ATTR, None)
+	if pending is None:
+		pending = set()
+		setattr(frappe.local, _PENDING_REFRESH_PAIRS_ATTR, pending)
+		frappe.db.after_commit.add(_flush_pending_item_price_refresh)
+		frappe.db.after_rollback.add(_discard_pending_item_price_refresh)
+
+	new_pairs = set(_deduplicate_pairs(item_pairs or [])) - pending
+	pending.update(new_pairs)
+	# Later hooks of this transaction must not reuse pre-movement snapshots. The
+	# Redis entries are cleared now as well as after commit, so a rollback or a
+	# reader before the commit does not leave a stale snapshot cached
+	invalidate_stock_snapshot_cache(item_code for item_code, _warehouse in new_pairs)
+
+
+def _flush_pending_item_price_refresh():
+	pending = getattr(frappe.local, _PENDING_REFRESH_PAIRS_ATTR, None)
+	_discard_pending_item_price_refresh()
+	if pending:
+		_dispatch_item_price_refresh(list(pending))
+
+
+def _discard_pending_item_price_refresh():
+	if hasattr(frappe.local, _PENDING_REFRESH_PAIRS_ATTR):
+		delattr(frappe.local, _PENDING_REFRESH_PAIRS_ATTR)
+
+
+def _dispatch_item_price_refresh(item_pairs):
+	"""Invalidate cached snapshots of committed movements and hand the pairs to the drainer."""
 	normalized = list(_deduplicate_pairs(item_pairs or []))
 	if not normalized:
 		return
 
+	invalidate_stock_snapshot_cache(item_code for item_code, _warehouse in normalized)
+
 	if frappe.flags.in_test or frappe.flags.in_install:
-		for pair in normalized:
-			update_item_prices_for_item(*pair)
+		refresh_item_prices_for_items(normalized, commit=False)
 		return
 
-	frappe.enqueue(
-		"apex_item.item_price_hooks.refresh_item_prices_for_items",
-		item_pairs=[{"item_code": item_code, "warehouse": warehouse} for item_code, warehouse in normalized],
-		queue="short",
-		timeout=300,
-		now=False,
-	)
+	mark_item_prices_dirty(normalized)
+
+
+def mark_item_prices_dirty(item_pairs):
+	"""
+	Add (item_code, warehouse) pairs to the site's dirty set and make sure one
+	drainer job is queued. Repeated events for the same pair coalesce in the
+	set, and events arriving while the drainer is queued share that job.
+	"""
+	members = [_encode_dirty_pair(pair) for pair in _deduplicate_pairs(item_pairs or [])]
+	if not members:
+		return
+
+	try:
+		frappe.cache().sadd(_DIRTY_SET_KEY, *members)
+		frappe.enqueue(
+			"apex_item.item_price_hooks.drain_item_price_refresh_queue",
+			queue="short",
+			timeout=300,
+			job_id=_DRAIN_JOB_ID,
+			deduplicate=True,
+		)
+	except Exception as e:
+		frappe.log_error(
+			f"Failed to queue Item Price refresh for {len(members)} pair(s): {e!s}",
+			"Apex Item - Refresh Queue Error",
+		)
+
+
+def drain_item_price_refresh_queue(debounce: bool = True):
+	"""
+	RQ job: refresh every pair accumulated in the dirty set, in bulk batches.
+
+	The short initial wait lets a burst of events (e.g. a long Stock Entry)
+	land in the set before the first batch is taken. Each batch is taken with
+	one SPOP, so concurrent drainers (the RQ job and the scheduled reconcile)
+	never process the same pair, and pairs marked while a batch runs are picked
+	up by the next round; a failed batch is put back for the next drain. Pairs whose item is
+	locked by another refresh are re-marked and retried in a later round, and
+	pairs whose snapshot failed are re-marked for the next drain.
+	"""
+	cache = frappe.cache()
+	if debounce:
+		time.sleep(_DRAIN_DEBOUNCE_SECONDS)
+
+	for _round in range(_DRAIN_MAX_ROUNDS):
+		members = cache.pipeline().spop(cache.make_key(_DIRTY_SET_KEY), _DRAIN_BATCH_SIZE).execute()[0]
+		if not members:
+			break
+
+		try:
+			stats = refresh_item_prices_for_items([_decode_dirty_pair(member) for member in members])
+			# Failed pairs went back into the set; leave them for the next drain
+			if stats.get("failed"):
+				break
+			# Locked items went back into the set; give their holders a moment
+			if stats.get("locked"):
+				time.sleep(_DRAIN_DEBOUNCE_SECONDS)
+		except Exception as e:
+			frappe.db.rollback()
+			cache.sadd(_DIRTY_SET_KEY, *members)
+			frappe.log_error(
+				f"Error draining Item Price refresh queue: {e!s}",
+				"Apex Item - Refresh Queue Error",
+			)
+			break
+
+
+def _encode_dirty_pair(pair) -> str:
+	return json.dumps([pair[0], pair[1] or None])
+
+
+def _decode_dirty_pair(member) -> tuple:
+	if isinstance(member, bytes):
+		member = member.decode()
+	item_code, warehouse = json.loads(member)
+	return item_code, warehouse
 
 
 def _deduplicate_pairs(item_pairs: Iterable[dict | tuple | list]):
@@ -336,51 +1096,83 @@ def _deduplicate_pairs(item_pairs: Iterable[dict | tuple | list]):
 		yield key
 
 
-def _iter_recent_bin_changes(minutes: int = 15, limit: int = 500):
+def _get_reconcile_cursor() -> tuple:
+	"""Return the persisted (modified, name) of the last reconciled Bin change."""
+	cursor = get_app_state(_RECONCILE_CURSOR_KEY)
+	if cursor:
+		try:
+			modified, name = cursor
+			return get_datetime(modified), name or ""
+		except Exception:
+			pass
+
+	# First run (or unreadable cursor): start from a short window instead of the full history
+	return add_to_date(now_datetime(), minutes=-_RECONCILE_INITIAL_LOOKBACK_MINUTES), ""
+
+
+def _save_reconcile_cursor(modified, name) -> None:
+	set_app_state(_RECONCILE_CURSOR_KEY, [str(modified), name])
+
+
+def _get_reconcile_until():
+	"""Upper bound on Bin.modified for the reconcile: now minus the commit grace period."""
+	grace = cint(frappe.conf.get("apex_item_reconcile_grace_minutes")) or _RECONCILE_GRACE_MINUTES
+	return add_to_date(now_datetime(), minutes=-grace)
+
+
+def _iter_bin_change_batches(
+	cursor,
+	batch_size: int = _RECONCILE_BATCH_SIZE,
+	max_batches: int = _RECONCILE_MAX_BATCHES,
+	until=None,
+):
 	"""
-	Yield (item_code, warehouse) pairs for Bins modified recently.
-	Used by the scheduler to reconcile Item Price quantities in case
-	background jobs were not running at the time of earlier events.
+	Yield batches of Bin rows (name, item_code, warehouse, modified) changed after
+	`cursor` and, with `until`, before it, ordered by (modified, name) so paging
+	never skips or repeats a row.
+	Stops after `max_batches`; the remainder is picked up by the next run.
 	"""
-	try:
-		# use fallback to limit to recent changes without heavy scans
+	modified, name = cursor
+	until_condition = "AND modified < %(until)s" if until else ""
+	for _batch in range(max_batches):
 		rows = frappe.db.sql(
-			"""
-			SELECT item_code, warehouse
-			FROM `tabBin`
-			WHERE modified >= NOW() - INTERVAL %s MINUTE
-			ORDER BY modified DESC
-			LIMIT %s
-		""",
-			(minutes, limit),
-			as_dict=True,
-		)
-	except Exception:
-		# If DB doesn't support INTERVAL in this dialect, fallback to latest rows
-		rows = frappe.db.sql(
-			"""
-			SELECT item_code, warehouse
+			f"""
+			SELECT name, item_code, warehouse, modified
 			FROM `tabBin`
-			ORDER BY modified DESC
-			LIMIT %s
+			WHERE modified >= %(modified)s
+				AND (modified > %(modified)s OR name > %(name)s)
+				{until_condition}
+			ORDER BY modified ASC, name ASC
+			LIMIT %(limit)s
 		""",
-			(limit,),
+			{"modified": modified, "name": name, "until": until, "limit": batch_size},
 			as_dict=True,
 		)
+		if not rows:
+			return
 
-	for r in rows or []:
-		item_code = r.get("item_code")
-		warehouse = r.get("warehouse")
-		if item_code:
-			yield {"item_code": item_code, "warehouse": warehouse}
+		yield rows
+
+		modified, name = rows[-1].modified, rows[-1].name
+		if len(rows) < batch_size:
+			return
 
 
 def scheduled_reconcile_item_price():
 	"""
-	Scheduled task: reconcile Item Price stock fields for items
-	with recently modified Bin rows. This provides a self-healing
+	Scheduled task: reconcile Item Price stock fields for every Bin
+	changed since the last successful run. This provides a self-healing
 	mechanism if workers were down when events fired.
-	
+
+	A persisted (modified, name) cursor is advanced after each batch is
+	refreshed, so busy sites never drop changes and no window is rescanned.
+	Only Bins modified before the commit grace period are read: a long stock
+	transaction commits rows stamped with its start time, and the cursor must
+	not pass them before they are visible.
+
+	In stock delta mode this is also the verifier: rows it has to change
+	are drift from the incremental updates and are counted in app state.
+
 	Safe to call even if scheduler/workers are not running - will
 	simply do nothing if database is not available.
 	"""
@@ -388,11 +1180,36 @@ def scheduled_reconcile_item_price():
 		# Ensure we have a database connection
 		if not frappe.db:
 			return
-		
-		item_pairs = list(_iter_recent_bin_changes())
-		if not item_pairs:
-			return
-		refresh_item_prices_for_items(item_pairs)
+
+		# Pick up pairs marked after the last drainer finished
+		drain_item_price_refresh_queue(debounce=False)
+
+		repaired = 0
+		last_batch = 0
+		until = _get_reconcile_until()
+		for rows in _iter_bin_change_batches(_get_reconcile_cursor(), until=until):
+			repaired += refresh_item_prices_for_items(rows, source="reconcile").written
+			_save_reconcile_cursor(rows[-1].modified, rows[-1].name)
+			frappe.db.commit()
+			last_batch = len(rows)
+
+		if last_batch < _RECONCILE_BATCH_SIZE:
+			# Every Bin before the bound is reconciled; the next run starts from the bound
+			_save_reconcile_cursor(until, "")
+			frappe.db.commit()
+
+		# With ledger deltas, every row the full recompute still had to change is drift
+		if is_stock_delta_mode():
+			drift = get_app_state(_STOCK_DELTA_DRIFT_KEY) or {}
+			set_app_state(
+				_STOCK_DELTA_DRIFT_KEY,
+				{
+					"checked_at": now_datetime(),
+					"last_repaired": repaired,
+					"total_repaired": cint(drift.get("total_repaired")) + repaired,
+				},
+			)
+			frappe.db.commit()
 	except Exception as e:
 		# Log but don't fail - scheduler tasks should be resilient
 		frappe.log_error(
@@ -415,68 +1232,271 @@ def refresh_item_price(name: str) -> dict:
 		frappe.throw("Item Price has no Item Code")
 	# Determine warehouse scope from row or item defaults
 	warehouse = getattr(doc, "stock_warehouse", None) or _get_item_default_warehouse(doc.item_code)
+	# Read the Bins directly: the snapshot cache only serves read-only views
 	snapshot = _get_stock_snapshot(doc.item_code, warehouse)
-	# Apply to doc and persist
+	# Apply to doc and persist only if something moved
+	stored = _get_stored_stock_values(doc)
 	_apply_snapshot_to_doc(doc, snapshot)
-	_update_item_price_row(doc.name, doc, {"stock_warehouse": warehouse} if warehouse and not getattr(doc, "stock_warehouse", None) else None)
+	written = _update_item_price_row(
+		doc.name,
+		doc,
+		{"stock_warehouse": warehouse} if warehouse and not getattr(doc, "stock_warehouse", None) else None,
+		stored=stored,
+		source="manual",
+	)
 	return {
 		"actual_qty": snapshot.get("actual_qty", 0),
 		"reserved_qty": snapshot.get("reserved_qty", 0),
 		"available_qty": snapshot.get("available_qty", 0),
 		"waiting_qty": snapshot.get("waiting_qty", 0),
 		"stock_warehouse": warehouse,
+		"written": written,
 	}
 
 
 @frappe.whitelist()
-def refresh_item_prices(names: list[str] | str) -> int:
+def get_live_stock_snapshots(names: list[str] | str) -> dict:
+	"""
+	Return live stock values for the given Item Price rows without writing them.
+	Snapshots are computed in bulk (or served from the snapshot cache), so the
+	list view can overlay fresh numbers on the current page without taking locks.
+	Returns {name: {actual_qty, reserved_qty, available_qty, waiting_qty, stock_warehouse}}.
+	"""
+	if isinstance(names, str):
+		try:
+			names = json.loads(names)
+		except Exception:
+			names = [n.strip() for n in names.split(",") if n.strip()]
+	names = list(dict.fromkeys(name for name in names or [] if name))[:_LIVE_SNAPSHOT_MAX_ROWS]
+	if not names:
+		return {}
+
+	rows = frappe.get_list(
+		"Item Price",
+		filters={"name": ("in", names), "item_code": ("is", "set")},
+		fields=["name", "item_code", "stock_warehouse"],
+		limit_page_length=0,
+	)
+	rows = _resolve_row_warehouses(rows)
+	snapshots = _get_stock_snapshots(((row.item_code, row.row_warehouse) for row in rows), use_cache=True)
+
+	live = {}
+	for row in rows:
+		snapshot = snapshots[(row.item_code, row.row_warehouse)]
+		live[row.name] = {fieldname: snapshot.get(fieldname, 0) for fieldname in _STOCK_QTY_FIELDS}
+		live[row.name]["stock_warehouse"] = row.row_warehouse
+	return live
+
+
+@frappe.whitelist()
+def refresh_item_prices(names: list[str] | str, max_staleness: int | None = None) -> int:
 	"""
 	Bulk refresh for multiple Item Price rows by name.
-	Returns the count of rows updated.
+	- max_staleness: seconds; rows synced more recently than this are left as they are.
+	Returns the count of rows refreshed, whether written or already up to date.
 	"""
 	if not names:
 		return 0
 	if isinstance(names, str):
 		try:
 			# accept JSON or comma-separated
-			import json
 			names = json.loads(names)
 		except Exception:
 			names = [n.strip() for n in names.split(",") if n.strip()]
 
-	updated = 0
-	for name in names:
-		try:
-			refresh_item_price(name)
-			updated += 1
-		except Exception:
-			# continue with others; log for debugging
-			frappe.log_error(f"Failed to refresh Item Price {name}", "Apex Item: refresh_item_prices")
+	rows = load_item_price_rows(names=names)
+	for row in rows:
+		if not row.item_code:
+			frappe.log_error(f"Failed to refresh Item Price {row.name}", "Apex Item: refresh_item_prices")
+
+	stats = refresh_item_price_rows(rows, commit=True, max_staleness=max_staleness)
 	frappe.db.commit()
-	return updated
+	return stats.written + stats.skipped
 
 
 @frappe.whitelist()
-def refresh_item_prices_by_filters(filters=None, limit: int = 1000) -> int:
+def refresh_item_prices_by_filters(filters=None, limit: int = 1000, max_staleness: int | None = None) -> int:
 	"""
 	Refresh Item Price rows matching list filters (current view).
 	- filters: can be a JSON string (from list view) or a python structure.
 	- limit: safety cap to avoid refreshing an extremely large dataset at once.
-	Returns the number of rows updated.
+	- max_staleness: seconds; rows synced more recently than this are left as they are.
+	Returns the number of rows refreshed.
 	"""
+	return refresh_item_prices(_get_item_price_names_by_filters(filters, limit), max_staleness=max_staleness)
+
+
+@frappe.whitelist()
+def enqueue_refresh_item_prices_by_filters(
+	filters=None, limit: int = 1000, max_staleness: int | None = None
+) -> dict:
+	"""
+	Background variant of `refresh_item_prices_by_filters` that returns at once.
+	Requests for the same filters and limit share one job id, so a refresh that
+	is already queued or running is returned instead of starting another one.
+	Per-chunk progress is published on the `apex_item_item_price_refresh`
+	realtime event to every user waiting on the job and can be polled with
+	`get_refresh_job_status`.
+	"""
+	frappe.has_permission("Item Price", "read", throw=True)
+
+	parsed = _parse_list_filters(filters)
+	limit = cint(limit) or 1000
+	max_staleness = cint(max_staleness) or None
+	filters_hash = hashlib.md5(json.dumps([parsed, limit, max_staleness], sort_keys=True, default=str).encode()).hexdigest()
+	job_id = f"apex_item_item_price_refresh_{filters_hash[:16]}"
+
+	# Joining a queued or running job keeps its status; the user just follows its progress
+	status = _get_refresh_job_status(job_id) or {}
+	users = sorted({*(status.get("users") or []), frappe.session.user})
+	if is_job_enqueued(job_id):
+		return _set_refresh_job_status(job_id, users=users)
+
+	job = frappe.enqueue(
+		"apex_item.item_price_hooks.run_refresh_item_prices_job",
+		queue="default",
+		timeout=1800,
+		job_id=job_id,
+		deduplicate=True,
+		refresh_job_id=job_id,
+		filters=parsed,
+		limit=limit,
+		max_staleness=max_staleness,
+	)
+	if not job:
+		# A concurrent request enqueued it first
+		return _set_refresh_job_status(job_id, users=users)
+	return _set_refresh_job_status(
+		job_id, status="queued", users=[frappe.session.user], total=0, processed=0, written=0, skipped=0
+	)
+
+
+@frappe.whitelist()
+def get_refresh_job_status(job_id: str) -> dict:
+	"""Return the last known status of a job started by `enqueue_refresh_item_prices_by_filters`."""
+	frappe.has_permission("Item Price", "read", throw=True)
+	return _get_refresh_job_status(job_id) or {"job_id": job_id, "status": "unknown"}
+
+
+@frappe.whitelist()
+def get_stock_staleness_stats(percentiles: str | list = "50,90,99") -> dict:
+	"""
+	Report how old the stored stock values of Item Price rows are: seconds since
+	`stock_synced_at` at the requested percentiles, rows never synced, and row
+	counts per sync source. Used to tune the reconcile schedule from data.
+	"""
+	frappe.only_for("System Manager")
+	if not frappe.db.has_column("Item Price", "stock_synced_at"):
+		return {}
+
+	if isinstance(percentiles, str):
+		percentiles = [percentile for percentile in percentiles.split(",") if percentile.strip()]
+	percentiles = sorted({min(max(flt(percentile), 0), 100) for percentile in percentiles})
+
+	now = now_datetime()
+	total = frappe.db.count("Item Price", {"item_code": ("is", "set")})
+	synced = frappe.db.count("Item Price", {"item_code": ("is", "set"), "stock_synced_at": ("is", "set")})
+
+	# The p-th percentile age is the row at that rank when ordered newest sync first
+	age_seconds = {}
+	for percentile in percentiles if synced else []:
+		offset = round(percentile / 100 * (synced - 1))
+		synced_at = frappe.db.sql(
+			"""
+			SELECT stock_synced_at
+			FROM `tabItem Price`
+			WHERE IFNULL(item_code, '') != '' AND stock_synced_at IS NOT NULL
+			ORDER BY stock_synced_at DESC
+			LIMIT 1 OFFSET %(offset)s
+			""",
+			{"offset": offset},
+		)[0][0]
+		age_seconds[f"p{percentile:g}"] = max((now - get_datetime(synced_at)).total_seconds(), 0)
+
+	by_source = frappe.db.sql(
+		"""
+		SELECT IFNULL(stock_sync_source, '') AS source, COUNT(*) AS count
+		FROM `tabItem Price`
+		WHERE IFNULL(item_code, '') != '' AND stock_synced_at IS NOT NULL
+		GROUP BY IFNULL(stock_sync_source, '')
+		""",
+		as_dict=True,
+	)
+
+	return {
+		"total": total,
+		"synced": synced,
+		"never_synced": total - synced,
+		"age_seconds": age_seconds,
+		"by_source": {row.source or "unknown": row.count for row in by_source},
+	}
+
+
+def run_refresh_item_prices_job(
+	refresh_job_id: str, filters=None, limit: int = 1000, max_staleness: int | None = None
+) -> None:
+	"""Worker: refresh the matching Item Price rows chunk by chunk, publishing progress."""
+	if not (_get_refresh_job_status(refresh_job_id) or {}).get("users"):
+		_set_refresh_job_status(refresh_job_id, users=[frappe.session.user])
 	try:
-		parsed = frappe.parse_json(filters) if isinstance(filters, str) else (filters or [])
+		names = _get_item_price_names_by_filters(filters, limit)
+		status = _set_refresh_job_status(
+			refresh_job_id, status="running", total=len(names), processed=0, written=0, skipped=0
+		)
+		_publish_refresh_job_status(status)
+
+		for start in range(0, len(names), _SNAPSHOT_CHUNK_SIZE):
+			rows = load_item_price_rows(names=names[start : start + _SNAPSHOT_CHUNK_SIZE])
+			stats = refresh_item_price_rows(rows, commit=True, max_staleness=max_staleness, source="list_view")
+			frappe.db.commit()
+			status = _set_refresh_job_status(
+				refresh_job_id,
+				status="running",
+				processed=min(start + _SNAPSHOT_CHUNK_SIZE, len(names)),
+				written=status["written"] + stats.written,
+				skipped=status["skipped"] + stats.skipped,
+			)
+			_publish_refresh_job_status(status)
+
+		status = _set_refresh_job_status(refresh_job_id, status="finished")
 	except Exception:
-		parsed = []
+		frappe.db.rollback()
+		frappe.log_error(frappe.get_traceback(), "Apex Item: run_refresh_item_prices_job")
+		status = _set_refresh_job_status(refresh_job_id, status="failed")
+	_publish_refresh_job_status(status)
 
-	# Get matching names within limit
-	names = frappe.get_all(
+
+def _get_item_price_names_by_filters(filters, limit) -> list[str]:
+	return frappe.get_all(
 		"Item Price",
-		filters=parsed or None,
-		fields=["name"],
-		limit_page_length=limit,
+		filters=_parse_list_filters(filters) or None,
+		pluck="name",
+		limit_page_length=cint(limit) or 1000,
 		order_by="modified desc",
 	)
-	name_list = [r["name"] for r in names]
-	return refresh_item_prices(name_list)
 
+
+def _parse_list_filters(filters):
+	try:
+		return frappe.parse_json(filters) if isinstance(filters, str) else (filters or [])
+	except Exception:
+		return []
+
+
+def _get_refresh_job_status(job_id) -> dict | None:
+	return frappe.cache().get_value(f"{_REFRESH_JOB_STATUS_KEY}:{job_id}")
+
+
+def _set_refresh_job_status(job_id, **values) -> dict:
+	status = _get_refresh_job_status(job_id) or {"job_id": job_id}
+	status.update(values)
+	frappe.cache().set_value(
+		f"{_REFRESH_JOB_STATUS_KEY}:{job_id}", status, expires_in_sec=_REFRESH_JOB_STATUS_TTL
+	)
+	return status
+
+
+def _publish_refresh_job_status(status) -> None:
+	# Every user whose request was collapsed into this job is waiting on it
+	for user in status.get("users") or []:
+		frappe.publish_realtime("apex_item_item_price_refresh", status, user=user)
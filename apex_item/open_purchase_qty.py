@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+"""
+Materialized open Purchase Order quantity per (item_code, warehouse).
+
+Item Price waiting_qty used to be summed from the whole Purchase Order history
+on every refresh. This app-owned table keeps the open quantity (qty not yet
+received on submitted POs) per item and warehouse. It is recomputed per item
+whenever a document that moves Purchase Order Item received_qty is submitted,
+cancelled or updated after submit: Purchase Orders, Purchase Receipts,
+Purchase Invoices with update_stock and Subcontracting Receipts. `rebuild_open_purchase_qty` repairs it.
+"""
+
+from __future__ import annotations
+
+import frappe
+
+from apex_item.app_tables import app_table_exists, drop_app_table, ensure_app_table
+
+OPEN_PURCHASE_QTY_TABLE = "apex_item_open_purchase_qty"
+
+# Item codes per recompute statement
+_CHUNK_SIZE = 500
+
+
+def ensure_open_purchase_qty_table() -> bool:
+	"""Create the table if missing and fill it. Returns True if it was created."""
+	return ensure_app_table(
+		OPEN_PURCHASE_QTY_TABLE,
+		f"""
+		CREATE TABLE IF NOT EXISTS `{OPEN_PURCHASE_QTY_TABLE}` (
+			`item_code` VARCHAR(140) NOT NULL,
+			`warehouse` VARCHAR(140) NOT NULL DEFAULT '',
+			`open_qty` DECIMAL(21,9) NOT NULL DEFAULT 0,
+			`modified` DATETIME(6) NULL,
+			PRIMARY KEY (`item_code`, `warehouse`)
+		) ENGINE=InnoDB ROW_FORMAT=DYNAMIC CHARACTER SET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+		""",
+		rebuild_open_purchase_qty,
+	)
+
+
+def drop_open_purchase_qty_table() -> None:
+	drop_app_table(OPEN_PURCHASE_QTY_TABLE)
+
+
+@frappe.whitelist()
+def rebuild_open_purchase_qty() -> int:
+	"""
+	Recompute the whole table from submitted Purchase Orders.
+	Usage: bench --site <site> execute apex_item.open_purchase_qty.rebuild_open_purchase_qty
+	Returns the number of (item_code, warehouse) rows stored.
+	"""
+	frappe.only_for("System Manager")
+
+	frappe.db.sql(f"DELETE FROM `{OPEN_PURCHASE_QTY_TABLE}`")
+	frappe.db.sql(
+		f"""
+		INSERT INTO `{OPEN_PURCHASE_QTY_TABLE}` (item_code, warehouse, open_qty, modified)
+		{_get_open_qty_select()}
+		"""
+	)
+	frappe.db.commit()
+	return frappe.db.sql(f"SELECT COUNT(*) FROM `{OPEN_PURCHASE_QTY_TABLE}`")[0][0]
+
+
+def update_open_purchase_qty_from_doc(doc, method=None):
+	"""Doc event helper for Purchase Order / Purchase Receipt submit, cancel and update after submit."""
+	item_codes = {row.item_code for row in doc.get("items") or [] if row.get("item_code")}
+	update_open_purchase_qty(item_codes)
+
+
+def update_open_purchase_qty_from_invoice(doc, method=None):
+	"""Doc event helper for Purchase Invoice submit and cancel; only stock-updating invoices receive PO qty."""
+	if doc.get("update_stock"):
+		update_open_purchase_qty_from_doc(doc, method)
+
+
+def update_open_purchase_qty_from_subcontracting_receipt(doc, method=None):
+	"""
+	Doc event helper for Subcontracting Receipt submit and cancel. The receipt
+	lists finished goods; the quantities it receives are booked on the lines of
+	the Purchase Orders behind its Subcontracting Orders.
+	"""
+	orders = {row.subcontracting_order for row in doc.get("items") or [] if row.get("subcontracting_order")}
+	if not orders:
+		return
+
+	update_open_purchase_qty(
+		frappe.db.sql_list(
+			"""
+			SELECT DISTINCT POI.item_code
+			FROM `tabPurchase Order Item` POI
+			INNER JOIN `tabSubcontracting Order` SCO ON SCO.purchase_order = POI.parent
+			WHERE SCO.name IN %(orders)s
+			""",
+			{"orders": tuple(orders)},
+		)
+	)
+
+
+def update_open_purchase_qty(item_codes) -> None:
+	"""Recompute the open quantity of every warehouse for the given items."""
+	item_codes = sorted({item_code for item_code in item_codes or [] if item_code})
+	if not item_codes or not _table_exists():
+		return
+
+	for start in range(0, len(item_codes), _CHUNK_SIZE):
+		params = {"item_codes": tuple(item_codes[start : start + _CHUNK_SIZE])}
+		frappe.db.sql(
+			f"DELETE FROM `{OPEN_PURCHASE_QTY_TABLE}` WHERE item_code IN %(item_codes)s",
+			params,
+		)
+		frappe.db.sql(
+			f"""
+			INSERT INTO `{OPEN_PURCHASE_QTY_TABLE}` (item_code, warehouse, open_qty, modified)
+			{_get_open_qty_select("POI.item_code IN %(item_codes)s")}
+			""",
+			params,
+		)
+
+
+def get_open_purchase_qty_rows(item_codes, warehouses=None) -> list:
+	"""
+	Return rows of (item_code, warehouse, waiting) for the given items, optionally
+	narrowed to `warehouses`. Reads the materialized table, or the Purchase Order
+	tables directly on sites where it has not been created yet.
+	"""
+	params = {"item_codes": tuple(item_codes)}
+	if warehouses:
+		params["warehouses"] = tuple(warehouses)
+
+	if not _table_exists():
+		conditions = ["POI.item_code IN %(item_codes)s"]
+		if warehouses:
+			conditions.append("POI.warehouse IN %(warehouses)s")
+		return frappe.db.sql(
+			f"""
+			SELECT item_code, NULLIF(warehouse, '') AS warehouse, open_qty AS waiting
+			FROM ({_get_open_qty_select(" AND ".join(conditions))}) open_po
+			""",
+			params,
+			as_dict=True,
+		)
+
+	conditions = ["item_code IN %(item_codes)s"]
+	if warehouses:
+		conditions.append("warehouse IN %(warehouses)s")
+	return frappe.db.sql(
+		f"""
+		SELECT item_code, NULLIF(warehouse, '') AS warehouse, open_qty AS waiting
+		FROM `{OPEN_PURCHASE_QTY_TABLE}`
+		WHERE {" AND ".join(conditions)}
+		""",
+		params,
+		as_dict=True,
+	)
+
+
+def _get_open_qty_select(condition: str | None = None) -> str:
+	conditions = ["PO.docstatus = 1", "POI.qty > POI.received_qty"]
+	if condition:
+		conditions.append(condition)
+
+	return f"""
+		SELECT
+			POI.item_code,
+			IFNULL(POI.warehouse, '') AS warehouse,
+			SUM(POI.qty - POI.received_qty) AS open_qty,
+			NOW(6) AS modified
+		FROM `tabPurchase Order Item` POI
+		INNER JOIN `tabPurchase Order` PO ON PO.name = POI.parent
+		WHERE {" AND ".join(conditions)}
+		GROUP BY POI.item_code, IFNULL(POI.warehouse, '')
+	"""
+
+
+def _table_exists(cached: bool = True) -> bool:
+	return app_table_exists(OPEN_PURCHASE_QTY_TABLE, cached=cached)
@@ -84,11 +84,18 @@ frappe.listview_settings["Item Price"] = {
 					console.warn("Failed to read filters from listview", e);
 				}
 
-				frappe.dom.freeze(__("Refreshing all items in current view..."));
+				frappe.show_alert({ message: __("Refreshing all items in current view..."), indicator: "blue" });
 				try {
-					await frappe.call({
-						method: "apex_item.item_price_hooks.refresh_item_prices_by_filters",
-						args: { filters },
+					await runItemPriceRefreshJob(filters, (status) => {
+						if (status.total) {
+							frappe.show_progress(
+								__("Refreshing Stock"),
+								status.processed,
+								status.total,
+								__("{0} of {1} rows", [status.processed, status.total]),
+								true
+							);
+						}
 					});
 					frappe.show_alert({ message: __("Refreshed current view"), indicator: "green" });
 					listview.refresh();
@@ -96,7 +103,7 @@ frappe.listview_settings["Item Price"] = {
 					console.error(e);
 					frappe.msgprint({ message: __("Failed to refresh current view."), indicator: "red" });
 				} finally {
-					frappe.dom.unfreeze();
+					frappe.hide_progress();
 				}
 			};
 
@@ -107,94 +114,55 @@ frappe.listview_settings["Item Price"] = {
 				// Fallback to menu item if button API unavailable
 				listview.page.add_menu_item(__("Refresh Stock (Current View)"), refreshAllInView);
 			}
+		}
+	},
+};
 
-			// Auto-refresh on first open/route change with throttling (60s per route+filter)
-			let autoSyncInProgress = false;
-			const readCurrentFilters = () => {
-				let filters = [];
-				try {
-					if (listview.filter_area && typeof listview.filter_area.get === "function") {
-						filters = listview.filter_area.get() || [];
-					} else if (typeof listview.get_filters_for_args === "function") {
-						filters = listview.get_filters_for_args() || [];
+// Start a background refresh for the given list filters and resolve once it finishes.
+// Progress arrives over realtime; the status endpoint is polled as a fallback.
+function runItemPriceRefreshJob(filters, onProgress) {
+	return frappe
+		.call({
+			method: "apex_item.item_price_hooks.enqueue_refresh_item_prices_by_filters",
+			args: { filters },
+		})
+		.then((response) => {
+			const jobId = response.message && response.message.job_id;
+			if (!jobId) {
+				throw new Error("Refresh job was not queued");
+			}
+
+			return new Promise((resolve, reject) => {
+				let pollTimer = null;
+				const done = (status) => {
+					frappe.realtime.off("apex_item_item_price_refresh", handler);
+					clearInterval(pollTimer);
+					if (status.status !== "finished") {
+						reject(status);
+					} else {
+						resolve(status);
 					}
-				} catch (e) {
-					console.warn("Failed to read filters from listview", e);
-				}
-				return filters;
-			};
-
-			const scheduleAutoRefresh = () => {
-				try {
-					const route = (frappe.get_route && frappe.get_route().join("/")) || "Item Price";
-					const filters = readCurrentFilters();
-					const key = `apex_item_ip_auto_sync:${route}:${JSON.stringify(filters)}`;
-					const last = Number(sessionStorage.getItem(key) || "0");
-					const now = Date.now();
-					// 60 seconds throttle
-					if (now - last < 60000) return;
-
-					// Run in background without freezing UI; show a subtle alert when done
-					autoSyncInProgress = true;
-					frappe.call({
-						method: "apex_item.item_price_hooks.refresh_item_prices_by_filters",
-						args: { filters },
-					}).then(() => {
-						sessionStorage.setItem(key, String(Date.now()));
-						// soft refresh: re-fetch data
-						const original = listview.render.bind(listview);
-						original(); // re-render without reentering the refresh wrapper
-						frappe.show_alert({ message: __("Stock synced"), indicator: "green" });
-					}).catch((e) => {
-						console.warn("Auto refresh failed", e);
-					}).finally(() => {
-						autoSyncInProgress = false;
-					});
-				} catch (e) {
-					console.warn("Auto refresh scheduling failed", e);
-				}
-			};
-
-			// Trigger once shortly after load to allow filters to render
-			setTimeout(scheduleAutoRefresh, 400);
+				};
+				const handler = (status) => {
+					if (!status || status.job_id !== jobId) return;
+					if (typeof onProgress === "function") onProgress(status);
+					if (["finished", "failed", "unknown"].includes(status.status)) done(status);
+				};
 
-			// Hook normal list view refresh (toolbar refresh) to auto-sync before rendering
-			if (typeof listview.refresh === "function") {
-				const originalRefresh = listview.refresh.bind(listview);
-				listview.refresh = function (...args) {
-					if (autoSyncInProgress) {
-						return originalRefresh(...args);
-					}
-					const route = (frappe.get_route && frappe.get_route().join("/")) || "Item Price";
-					const filters = readCurrentFilters();
-					const key = `apex_item_ip_auto_sync:${route}:${JSON.stringify(filters)}`;
-					const last = Number(sessionStorage.getItem(key) || "0");
-					const now = Date.now();
-					// If throttled, just refresh normally
-					if (now - last < 60000) {
-						return originalRefresh(...args);
-					}
-					autoSyncInProgress = true;
-					return frappe
+				frappe.realtime.on("apex_item_item_price_refresh", handler);
+				pollTimer = setInterval(() => {
+					frappe
 						.call({
-							method: "apex_item.item_price_hooks.refresh_item_prices_by_filters",
-							args: { filters },
-						})
-						.then(() => {
-							sessionStorage.setItem(key, String(Date.now()));
-						})
-						.catch((e) => {
-							console.warn("Refresh hook auto-sync failed", e);
+							method: "apex_item.item_price_hooks.get_refresh_job_status",
+							args: { job_id: jobId },
+							freeze: false,
 						})
-						.finally(() => {
-							autoSyncInProgress = false;
-							originalRefresh(...args);
-						});
-				};
-			}
-		}
-	},
-};
+						.then((r) => handler(r.message))
+						.catch(() => {});
+				}, 5000);
+			});
+		});
+}
 
 function getFieldDefinitions() {
 	return {
@@ -360,47 +328,53 @@ function initializeItemPriceView(listview, config) {
 		});
 	};
 
+	let lastOverlayKey = null;
+	let lastOverlayAt = 0;
+	const overlayLiveStock = debounce(() => {
+		const names = (listview.data || []).map((row) => row.name).filter(Boolean);
+		if (!names.length) return;
+		const key = names.join("\n");
+		if (key === lastOverlayKey && Date.now() - lastOverlayAt < 30000) return;
+
+		frappe
+			.call({
+				method: "apex_item.item_price_hooks.get_live_stock_snapshots",
+				args: { names },
+				freeze: false,
+			})
+			.then((response) => {
+				const live = response.message || {};
+				let changed = false;
+				lastOverlayKey = key;
+				lastOverlayAt = Date.now();
+
+				(listview.data || []).forEach((row) => {
+					const values = live[row.name];
+					if (!values) return;
+					Object.keys(values).forEach((fieldname) => {
+						if (String(row[fieldname] ?? "") !== String(values[fieldname] ?? "")) {
+							row[fieldname] = values[fieldname];
+							changed = true;
+						}
+					});
+				});
+
+				if (changed) {
+					originalRender();
+					if (isMobile()) renderCards();
+				}
+			})
+			.catch(() => {});
+	}, 500);
+
 	const originalRender = listview.render.bind(listview);
 	listview.render = function () {
 		originalRender();
 		if (isMobile()) {
 			setTimeout(renderCards, 60);
 		}
-		// Auto-sync after render (debounced) so it works on normal refresh and first load
-		if (typeof listview._apex_ip_auto_sync !== "function") {
-			// define once
-			const readFilters = () => {
-				try {
-					if (listview.filter_area && typeof listview.filter_area.get === "function") {
-						return listview.filter_area.get() || [];
-					}
-					if (typeof listview.get_filters_for_args === "function") {
-						return listview.get_filters_for_args() || [];
-					}
-				} catch (e) {}
-				return [];
-			};
-			listview._apex_ip_auto_sync = debounce(() => {
-				try {
-					const route = (frappe.get_route && frappe.get_route().join("/")) || "Item Price";
-					const filters = readFilters();
-					const key = `apex_item_ip_auto_sync:${route}:${JSON.stringify(filters)}`;
-					const last = Number(sessionStorage.getItem(key) || "0");
-					const now = Date.now();
-					if (now - last < 60000) return; // throttle 60s
-
-					frappe.call({
-						method: "apex_item.item_price_hooks.refresh_item_prices_by_filters",
-						args: { filters },
-					}).then(() => {
-						sessionStorage.setItem(key, String(Date.now()));
-						// re-render quietly
-						originalRender();
-					}).catch(() => {});
-				} catch (e) {}
-			}, 1000);
-		}
-		listview._apex_ip_auto_sync();
+		// Overlay live stock values on the visible rows (read-only, no writes)
+		overlayLiveStock();
 	};
 
 	let resizeTimer = null;
@@ -415,8 +389,38 @@ function initializeItemPriceView(listview, config) {
 		}, 200);
 	});
 
+	// Stock refreshes publish {name: changed fields}; patch matching rows and cards in place
+	const rerenderList = debounce(() => originalRender(), 300);
+	const onStockDiff = (message) => {
+		const diffs = (message && message.rows) || {};
+		let patched = false;
+
+		(listview.data || []).forEach((row) => {
+			const changed = diffs[row.name];
+			if (!changed) return;
+			Object.assign(row, changed);
+			patched = true;
+
+			if (isMobile() && $cardsContainer) {
+				const $existing = $cardsContainer.find(".item-price-card").filter(function () {
+					return $(this).attr("data-name") === row.name;
+				});
+				const $card = createItemPriceCard(row, config);
+				if ($existing.length && $card) {
+					$existing.replaceWith($card);
+				}
+			}
+		});
+
+		if (patched && !isMobile()) {
+			rerenderList();
+		}
+	};
+	frappe.realtime.on("apex_item_item_price_stock", onStockDiff);
+
 	const teardown = () => {
 		$(window).off("resize.item-price-view");
+		frappe.realtime.off("apex_item_item_price_stock", onStockDiff);
 	};
 
 	if (listview.page) {
@@ -457,7 +461,7 @@ function createItemPriceCard(data, config) {
 		: "";
 
 	const $card = $(
-		`<div class="item-price-card">
+		`<div class="item-price-card" data-name="${frappe.utils.escape_html(data.name || "")}">
 			<div class="${headerClass}">
 				${thumbHtml}
 				<div class="card-header-text">
@@ -0,0 +1,238 @@
+# -*- coding: utf-8 -*-
+"""
+Materialized purchase history per item for the last foreign purchase lookup.
+
+Finding an item's last purchase used to scan the Purchase Invoice, Receipt and
+Order history plus every Landed Cost Voucher on each lookup. This app-owned
+table keeps one row per submitted purchase document and item: the document's
+date, currency, rates, supplier and company, and the charges of the latest
+submitted LCV line booked against it. Rows are recomputed per document when a
+purchase document or an LCV is submitted or cancelled. `rebuild_purchase_ledger`
+repairs it.
+"""
+
+from __future__ import annotations
+
+import frappe
+
+from apex_item.app_tables import app_table_exists, drop_app_table, ensure_app_table
+
+PURCHASE_LEDGER_TABLE = "apex_item_purchase_ledger"
+
+# Purchase documents with their date field and tie-break priority on equal dates
+_LEDGER_DOCTYPES = {
+	"Purchase Invoice": ("posting_date", 1),
+	"Purchase Receipt": ("posting_date", 2),
+	"Purchase Order": ("transaction_date", 3),
+}
+_LCV_DOCTYPES = ("Purchase Invoice", "Purchase Receipt")
+
+_LEDGER_COLUMNS = (
+	"item_code",
+	"voucher_type",
+	"voucher_no",
+	"priority",
+	"purchase_date",
+	"creation",
+	"currency",
+	"conversion_rate",
+	"base_net_rate",
+	"conversion_factor",
+	"supplier",
+	"company",
+	"lcv_name",
+	"lcv_posting_date",
+	"lcv_creation",
+	"lcv_idx",
+	"lcv_charges",
+	"modified",
+)
+
+# Latest purchase of an item, the item's latest LCV line, and the rows of one LCV
+_LEDGER_INDEXES = {
+	"item_purchase_date": "`item_code`, `purchase_date` DESC, `priority`, `creation` DESC",
+	"item_lcv_date": "`item_code`, `lcv_posting_date` DESC, `lcv_creation` DESC, `lcv_idx`",
+	"lcv_item": "`lcv_name`, `item_code`",
+}
+
+
+def ensure_purchase_ledger_table() -> bool:
+	"""Create the table if missing and fill it. Returns True if it was created."""
+	index_ddl = "".join(f",\n\t\t\tKEY `{name}` ({columns})" for name, columns in _LEDGER_INDEXES.items())
+	return ensure_app_table(
+		PURCHASE_LEDGER_TABLE,
+		f"""
+		CREATE TABLE IF NOT EXISTS `{PURCHASE_LEDGER_TABLE}` (
+			`item_code` VARCHAR(140) NOT NULL,
+			`voucher_type` VARCHAR(140) NOT NULL,
+			`voucher_no` VARCHAR(140) NOT NULL,
+			`priority` TINYINT NOT NULL,
+			`purchase_date` DATE NULL,
+			`creation` DATETIME(6) NULL,
+			`currency` VARCHAR(140) NULL,
+			`conversion_rate` DECIMAL(21,9) NOT NULL DEFAULT 0,
+			`base_net_rate` DECIMAL(21,9) NOT NULL DEFAULT 0,
+			`conversion_factor` DECIMAL(21,9) NOT NULL DEFAULT 0,
+			`supplier` VARCHAR(140) NULL,
+			`company` VARCHAR(140) NULL,
+			`lcv_name` VARCHAR(140) NULL,
+			`lcv_posting_date` DATE NULL,
+			`lcv_creation` DATETIME(6) NULL,
+			`lcv_idx` INT NULL,
+			`lcv_charges` DECIMAL(21,9) NOT NULL DEFAULT 0,
+			`modified` DATETIME(6) NULL,
+			PRIMARY KEY (`voucher_type`, `voucher_no`, `item_code`){index_ddl}
+		) ENGINE=InnoDB ROW_FORMAT=DYNAMIC CHARACTER SET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+		""",
+		rebuild_purchase_ledger,
+		indexes=_LEDGER_INDEXES,
+	)
+
+
+def drop_purchase_ledger_table() -> None:
+	drop_app_table(PURCHASE_LEDGER_TABLE)
+
+
+@frappe.whitelist()
+def rebuild_purchase_ledger() -> int:
+	"""
+	Recompute the whole table from submitted purchase documents and LCVs.
+	Usage: bench --site <site> execute apex_item.purchase_ledger.rebuild_purchase_ledger
+	Returns the number of (document, item) rows stored.
+	"""
+	frappe.only_for("System Manager")
+
+	frappe.db.sql(f"DELETE FROM `{PURCHASE_LEDGER_TABLE}`")
+	for doctype in _LEDGER_DOCTYPES:
+		_insert_ledger_rows(doctype)
+	frappe.db.commit()
+	return frappe.db.sql(f"SELECT COUNT(*) FROM `{PURCHASE_LEDGER_TABLE}`")[0][0]
+
+
+def update_purchase_ledger_from_doc(doc, method=None):
+	"""Doc event helper for Purchase Order / Receipt / Invoice submit, cancel and update after submit."""
+	update_purchase_ledger(doc.doctype, [doc.name])
+
+
+def update_purchase_ledger_from_lcv(doc, method=None):
+	"""Doc event helper for Landed Cost Voucher submit and cancel: refresh the receipts it charges."""
+	receipts = {}
+	for row in doc.get("items") or []:
+		if row.get("receipt_document_type") in _LCV_DOCTYPES and row.get("receipt_document"):
+			receipts.setdefault(row.receipt_document_type, set()).add(row.receipt_document)
+
+	for doctype, names in receipts.items():
+		update_purchase_ledger(doctype, names)
+
+
+def update_purchase_ledger(doctype, names) -> None:
+	"""Recompute the rows of the given purchase documents; cancelled ones are removed."""
+	names = sorted({name for name in names or [] if name})
+	if doctype not in _LEDGER_DOCTYPES or not names or not _table_exists():
+		return
+
+	params = {"voucher_type": doctype, "names": tuple(names)}
+	frappe.db.sql(
+		f"DELETE FROM `{PURCHASE_LEDGER_TABLE}` WHERE voucher_type = %(voucher_type)s AND voucher_no IN %(names)s",
+		params,
+	)
+	_insert_ledger_rows(doctype, params)
+
+
+def get_purchase_ledger_rows(item_code) -> list | None:
+	"""
+	Return the ledger rows the last purchase lookup needs: the item's latest
+	purchase first (date, then PI > PR > PO, then newest creation), followed by
+	the item's rows charged by its latest LCV. Returns None on sites where the
+	table has not been created yet so callers can fall back to the documents.
+	"""
+	if not _table_exists():
+		return None
+
+	params = {"item_code": item_code}
+	latest = frappe.db.sql(
+		f"""
+		SELECT *
+		FROM `{PURCHASE_LEDGER_TABLE}`
+		WHERE item_code = %(item_code)s
+		ORDER BY purchase_date DESC, priority, creation DESC
+		LIMIT 1
+		""",
+		params,
+		as_dict=True,
+	)
+	if not latest:
+		return []
+
+	return latest + frappe.db.sql(
+		f"""
+		SELECT *
+		FROM `{PURCHASE_LEDGER_TABLE}`
+		WHERE item_code = %(item_code)s AND lcv_name = (
+			SELECT lcv_name
+			FROM `{PURCHASE_LEDGER_TABLE}`
+			WHERE item_code = %(item_code)s AND lcv_name IS NOT NULL
+			ORDER BY lcv_posting_date DESC, lcv_creation DESC, lcv_idx
+			LIMIT 1
+		)
+		""",
+		params,
+		as_dict=True,
+	)
+
+
+def _insert_ledger_rows(doctype, params=None) -> None:
+	date_field, priority = _LEDGER_DOCTYPES[doctype]
+	doc_condition = "AND P.name IN %(names)s" if params else ""
+
+	# Purchase Orders carry no landed costs
+	lcv_columns = "NULL, NULL, NULL, NULL, 0"
+	lcv_join = ""
+	if doctype in _LCV_DOCTYPES:
+		lcv_columns = "lcv.name, lcv.posting_date, lcv.creation, lcv.idx, IFNULL(lcv.applicable_charges, 0)"
+		# Latest submitted LCV line per (document, item)
+		lcv_join = f"""
+			LEFT JOIN (
+				SELECT
+					LCI.receipt_document, LCI.item_code, LCI.applicable_charges, LCI.idx,
+					LCV.name, LCV.posting_date, LCV.creation,
+					ROW_NUMBER() OVER (
+						PARTITION BY LCI.receipt_document, LCI.item_code
+						ORDER BY LCV.posting_date DESC, LCV.creation DESC, LCI.idx
+					) AS row_rank
+				FROM `tabLanded Cost Voucher` LCV
+				INNER JOIN `tabLanded Cost Item` LCI ON LCI.parent = LCV.name
+				WHERE LCV.docstatus = 1 AND LCI.receipt_document_type = '{doctype}'
+					{"AND LCI.receipt_document IN %(names)s" if params else ""}
+			) lcv ON lcv.receipt_document = doc_items.name
+				AND lcv.item_code = doc_items.item_code
+				AND lcv.row_rank = 1
+		"""
+
+	frappe.db.sql(
+		f"""
+		INSERT INTO `{PURCHASE_LEDGER_TABLE}` ({", ".join(_LEDGER_COLUMNS)})
+		SELECT
+			doc_items.item_code, '{doctype}', doc_items.name, {priority},
+			doc_items.purchase_date, doc_items.creation, doc_items.currency,
+			IFNULL(doc_items.conversion_rate, 0), IFNULL(doc_items.base_net_rate, 0),
+			IFNULL(doc_items.conversion_factor, 0), doc_items.supplier, doc_items.company,
+			{lcv_columns}, NOW(6)
+		FROM (
+			SELECT
+				P.name, P.{date_field} AS purchase_date, P.creation, P.currency, P.conversion_rate,
+				P.supplier, P.company, I.item_code, I.base_net_rate, I.conversion_factor,
+				ROW_NUMBER() OVER (PARTITION BY P.name, I.item_code ORDER BY I.idx) AS row_rank
+			FROM `tab{doctype}` P
+			INNER JOIN `tab{doctype} Item` I ON I.parent = P.name
+			WHERE P.docstatus = 1 AND I.item_code IS NOT NULL {doc_condition}
+		) doc_items
+		{lcv_join}
+		WHERE doc_items.row_rank = 1
+		""",
+		params or {},
+	)
+
+
+def _table_exists(cached: bool = True) -> bool:
+	return app_table_exists(PURCHASE_LEDGER_TABLE, cached=cached)
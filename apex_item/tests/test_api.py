@@ -6,10 +6,13 @@
 
 from __future__ import annotations
 
+from unittest.mock import patch
+
 import frappe
 from frappe.tests.utils import FrappeTestCase
 
 from apex_item import api
+from apex_item.app_state import get_app_state, set_app_state
 
 
 class TestApexItemAPI(FrappeTestCase):
@@ -134,4 +137,44 @@ class TestApexItemAPI(FrappeTestCase):
 		self.assertIsInstance(result, dict)
 		self.assertIn("card_fields", result)
 
-
+	def test_reconcile_shards_report_combined_status(self):
+		"""Test that two reconcile shards checkpoint separately and add up to a finished run"""
+		run_id = frappe.generate_hash(length=10)
+		total = frappe.db.count("Item Price", {"item_code": ("is", "set")})
+		set_app_state(
+			api._ITEM_PRICE_RECONCILE_RUN_KEY,
+			{"run_id": run_id, "shards": 2, "total": total, "user": "Administrator", "max_staleness": None},
+		)
+
+		with patch.object(frappe.db, "commit"), patch(
+			"apex_item.api.refresh_item_price_rows", return_value=frappe._dict(written=0)
+		):
+			api.reconcile_item_price_shard(run_id, 0, 2)
+			partial = api.get_item_price_reconcile_status()
+			api.reconcile_item_price_shard(run_id, 1, 2)
+		status = api.get_item_price_reconcile_status()
+
+		self.assertEqual(partial["shards_done"], 1)
+		self.assertFalse(partial["finished"])
+		self.assertEqual(status["run_id"], run_id)
+		self.assertEqual(status["shards_done"], 2)
+		self.assertTrue(status["finished"])
+		self.assertEqual(status["processed"], total)
+		self.assertEqual(get_app_state(api._get_reconcile_shard_key(run_id, 1))["done"], 1)
+
+	def test_new_reconcile_run_refused_while_shards_active(self):
+		"""Test that a new run is not started while a shard job of the previous run is queued"""
+		run_id = frappe.generate_hash(length=10)
+		run = {"run_id": run_id, "shards": 2, "total": 0, "user": "Administrator", "max_staleness": None}
+		set_app_state(api._ITEM_PRICE_RECONCILE_RUN_KEY, run)
+		active_job = api._get_reconcile_shard_job_id(run_id, 1)
+
+		with patch("apex_item.api.is_job_enqueued", side_effect=lambda job_id: job_id == active_job), patch(
+			"apex_item.api.frappe.enqueue"
+		) as enqueue:
+			result = api.update_all_item_price_qty(shards=4)
+
+		enqueue.assert_not_called()
+		self.assertFalse(result["success"])
+		self.assertEqual((result["run_id"], result["active"]), (run_id, 1))
+		self.assertEqual(get_app_state(api._ITEM_PRICE_RECONCILE_RUN_KEY)["run_id"], run_id)
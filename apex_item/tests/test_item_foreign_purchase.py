@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2025, Apex Item
+# License: MIT. See LICENSE
+
+"""Tests for the last foreign purchase engine"""
+
+from __future__ import annotations
+
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from apex_item.item_foreign_purchase import (
+	_build_purchase_info,
+	_get_lcv_purchase_rows,
+	_pick_latest_purchase,
+	_pick_lcv_purchase,
+	_pick_ledger_purchase,
+	clear_company_defaults_cache,
+	get_company_defaults,
+	get_foreign_purchase_item_values,
+	get_item_foreign_purchase_info,
+	get_items_foreign_purchase_info,
+)
+from apex_item.purchase_ledger import ensure_purchase_ledger_table
+from apex_item.tests.utils import (
+	get_test_warehouse,
+	make_landed_cost_voucher,
+	make_purchase_invoice,
+	make_purchase_receipt,
+	make_test_item,
+)
+
+
+class TestItemForeignPurchase(FrappeTestCase):
+	"""Test cases for the purchase document merge shared by the single-item and bulk paths"""
+
+	def purchase_row(self, name, date, date_field="posting_date", **values):
+		return frappe._dict(
+			{
+				"name": name,
+				date_field: date,
+				"currency": "USD",
+				"conversion_rate": 50.0,
+				"conversion_factor": 1.0,
+				"base_net_rate": 500.0,
+				"supplier": "Test Supplier",
+				"company": "Test Company",
+				**values,
+			}
+		)
+
+	def test_latest_purchase_precedence(self):
+		"""Test that the newest document wins and equal dates prefer PI over PR over PO"""
+		pi = self.purchase_row("PI-1", "2025-01-10")
+		pr = self.purchase_row("PR-1", "2025-01-10")
+		po = self.purchase_row("PO-1", "2025-02-01", date_field="transaction_date")
+
+		self.assertEqual(_pick_latest_purchase(pi, pr, None).voucher_no, "PI-1")
+		self.assertEqual(_pick_latest_purchase(pi, pr, po).voucher_type, "Purchase Order")
+		self.assertIsNone(_pick_latest_purchase(None, None, None))
+
+	def test_lcv_purchase_prefers_invoice(self):
+		"""Test that an LCV's first invoice beats its receipts and missing documents are skipped"""
+		receipts = [
+			("Purchase Receipt", "PR-1", self.purchase_row("PR-1", "2025-03-01")),
+			("Purchase Invoice", "PI-9", None),
+			("Purchase Invoice", "PI-1", self.purchase_row("PI-1", "2025-01-01")),
+		]
+
+		self.assertEqual(_pick_lcv_purchase(iter(receipts)).voucher_no, "PI-1")
+		self.assertEqual(_pick_lcv_purchase(iter(receipts[:2])).voucher_no, "PR-1")
+
+	def test_build_purchase_info_converts_charges(self):
+		"""Test that rate and LCV charges are converted with the document's exchange rate"""
+		purchase = _pick_latest_purchase(self.purchase_row("PI-1", "2025-01-10"), None, None)
+
+		info = _build_purchase_info(purchase, 1000.0, "LCV-1", "EGP")
+
+		self.assertEqual(info["rate"], 10.0)
+		self.assertEqual(info["applicable_charges"], 20.0)
+		self.assertEqual(info["purchase_date"], "2025-01-10")
+		self.assertEqual(get_foreign_purchase_item_values(info)["item_foreign_purchase_lcv"], "LCV-1")
+		self.assertEqual(get_foreign_purchase_item_values({})["item_foreign_purchase_rate"], 0)
+
+	def test_single_item_lookup_query_count(self):
+		"""Test that an item without an LCV is resolved with one LCV lookup and one purchase query"""
+		with patch("apex_item.item_foreign_purchase.get_purchase_ledger_rows", return_value=None), patch.object(
+			frappe.db, "sql", wraps=frappe.db.sql
+		) as sql:
+			info = get_item_foreign_purchase_info(f"TEST-NO-PURCHASE-{frappe.generate_hash(length=6)}")
+
+		self.assertEqual(info, {})
+		self.assertEqual(sql.call_count, 2)
+
+	def test_company_defaults_cached_until_company_changes(self):
+		"""Test that company currencies are served from cache until the Company hook clears it"""
+		company = frappe.db.get_value("Company", {}, "name")
+		if not company:
+			self.skipTest("No Company on this site")
+		self.addCleanup(clear_company_defaults_cache)
+		self.addCleanup(frappe.db.rollback)
+
+		currency = get_company_defaults()[company]["default_currency"]
+		frappe.db.set_value("Company", company, "default_currency", "TST")
+		self.assertEqual(get_company_defaults()[company]["default_currency"], currency)
+
+		clear_company_defaults_cache()
+		self.assertEqual(get_company_defaults()[company]["default_currency"], "TST")
+
+	def test_ledger_purchase_prefers_latest_lcv_document(self):
+		"""Test that ledger rows follow the LCV document first and fall back to the latest purchase"""
+		lcv = {"lcv_name": "LCV-1", "lcv_posting_date": "2025-01-05", "lcv_creation": "2025-01-05 10:00:00", "lcv_idx": 1}
+		po = self.purchase_row("PO-1", "2025-02-01", date_field="purchase_date", voucher_type="Purchase Order", voucher_no="PO-1")
+		pi = self.purchase_row(
+			"PI-1", "2025-01-01", date_field="purchase_date", voucher_type="Purchase Invoice", voucher_no="PI-1", lcv_charges=300.0, **lcv
+		)
+
+		purchase, charges, lcv_name = _pick_ledger_purchase([po, pi])
+		self.assertEqual((purchase.voucher_no, charges, lcv_name), ("PI-1", 300.0, "LCV-1"))
+
+		pi.lcv_charges = 0
+		purchase, charges, lcv_name = _pick_ledger_purchase([po, pi])
+		self.assertEqual((purchase.voucher_no, charges, lcv_name), ("PO-1", 0.0, None))
+
+	def test_bulk_lookup_matches_single_item_lookup(self):
+		"""Test that the bulk engine, the document lookup and the ledger lookup agree on real documents"""
+		self.addCleanup(frappe.db.rollback)
+		ensure_purchase_ledger_table()
+		item_code = make_test_item()
+		warehouse = get_test_warehouse()
+
+		pr = make_purchase_receipt(item_code, warehouse, qty=5, rate=100)
+		make_purchase_invoice(item_code, warehouse, qty=2, rate=120)
+		lcv = make_landed_cost_voucher([pr], charges=50)
+
+		bulk = get_items_foreign_purchase_info([item_code])[item_code]
+		with patch("apex_item.item_foreign_purchase.get_purchase_ledger_rows", return_value=None):
+			documents = get_item_foreign_purchase_info(item_code)
+
+		self.assertEqual(bulk["lcv_name"], lcv.name)
+		self.assertEqual(bulk, documents)
+		self.assertEqual(bulk, get_item_foreign_purchase_info(item_code))
+
+	def test_lcv_purchase_rows_prefer_submitted_invoice(self):
+		"""Test that an LCV over an invoice and a receipt of the item resolves to the invoice, skipping unsubmitted ones"""
+		self.addCleanup(frappe.db.rollback)
+		item_code = make_test_item()
+		warehouse = get_test_warehouse()
+
+		pr = make_purchase_receipt(item_code, warehouse, qty=5, rate=100)
+		pi = make_purchase_invoice(item_code, warehouse, qty=3, rate=120, update_stock=1)
+		lcv = make_landed_cost_voucher([pr, pi], charges=80)
+		key = (lcv.name, item_code)
+
+		rows = _get_lcv_purchase_rows({key})[key]
+		self.assertEqual({(doctype, name) for doctype, name, _row in rows}, {(pr.doctype, pr.name), (pi.doctype, pi.name)})
+		self.assertEqual(_pick_lcv_purchase(rows).voucher_no, pi.name)
+
+		frappe.db.set_value("Purchase Invoice", pi.name, "docstatus", 0)
+		rows = _get_lcv_purchase_rows({key})[key]
+		self.assertEqual([(doctype, name) for doctype, name, _row in rows], [(pr.doctype, pr.name)])
+		self.assertEqual(_pick_lcv_purchase(rows).voucher_no, pr.name)
+
+		frappe.db.set_value("Purchase Receipt", pr.name, "docstatus", 0)
+		self.assertNotIn(key, _get_lcv_purchase_rows({key}))
@@ -9,13 +9,46 @@ from unittest.mock import patch
 
 import frappe
 from frappe.tests.utils import FrappeTestCase
-from frappe.utils import flt
+from frappe.utils import add_to_date, flt
 
+from apex_item.bulk_write import bulk_update_values
+from apex_item.db_indexes import APP_INDEXES, ensure_indexes
+from apex_item.item_locks import acquire_item_locks, release_item_locks
 from apex_item.item_price_hooks import (
+	_DIRTY_SET_KEY,
+	_PENDING_STOCK_DELTAS_ATTR,
+	_SNAPSHOT_CACHE_KEY,
+	_apply_pending_stock_deltas,
+	_clear_snapshot_memo,
+	_decode_dirty_pair,
+	_discard_pending_item_price_refresh,
+	_enqueue_item_price_refresh,
+	_flush_pending_item_price_refresh,
+	_get_item_default_warehouses,
+	_get_stock_snapshot,
+	_get_stock_snapshots,
+	_iter_bin_change_batches,
+	_publish_refresh_job_status,
+	_read_cached_default_warehouses,
+	_read_cached_snapshots,
+	_set_refresh_job_status,
+	clear_item_default_warehouse_cache,
+	drain_item_price_refresh_queue,
+	enqueue_refresh_item_prices_by_filters,
+	get_live_stock_snapshots,
+	get_refresh_job_status,
+	get_stock_staleness_stats,
+	invalidate_stock_snapshot_cache,
+	load_item_price_rows,
+	mark_item_prices_dirty,
 	refresh_item_price,
+	refresh_item_price_rows,
 	refresh_item_prices,
 	refresh_item_prices_by_filters,
+	run_refresh_item_prices_job,
 	set_stock_fields,
+	update_item_price_from_bin,
+	update_item_prices_from_stock_ledger,
 )
 
 
@@ -44,6 +77,8 @@ class TestItemPriceHooks(FrappeTestCase):
 		frappe.db.rollback()
 		frappe.db.begin()
 		frappe.set_user("Administrator")
+		# Cached snapshots outlive the rollback of the test that stored them
+		frappe.cache().delete_keys(_SNAPSHOT_CACHE_KEY)
 
 	def tearDown(self):
 		"""Clean up after each test"""
@@ -302,4 +337,420 @@ class TestItemPriceHooks(FrappeTestCase):
 		self.assertEqual(flt(item_price.available_qty), 0.0)
 		self.assertEqual(flt(item_price.waiting_qty), 0.0)
 
+	def test_bulk_stock_snapshots(self):
+		"""Test that bulk snapshots return warehouse and all-warehouse totals in one call"""
+		self.create_test_bin(actual_qty=40.0, reserved_qty=10.0)
 
+		snapshots = _get_stock_snapshots(
+			[(self.test_item, self.test_warehouse), (self.test_item, None), ("NON-EXISTENT-ITEM", None)]
+		)
+
+		self.assertEqual(len(snapshots), 3)
+		warehouse_snapshot = snapshots[(self.test_item, self.test_warehouse)]
+		self.assertEqual(flt(warehouse_snapshot["actual_qty"]), 40.0)
+		self.assertEqual(flt(warehouse_snapshot["available_qty"]), 30.0)
+		self.assertGreaterEqual(flt(snapshots[(self.test_item, None)]["actual_qty"]), 40.0)
+		self.assertEqual(flt(snapshots[("NON-EXISTENT-ITEM", None)]["actual_qty"]), 0.0)
+
+	def test_bulk_update_values(self):
+		"""Test that bulk_update_values writes per-row payloads in one statement"""
+		item_price1 = self.create_test_item_price()
+		item_price2 = self.create_test_item_price()
+
+		written = bulk_update_values(
+			"Item Price",
+			{
+				item_price1.name: {"actual_qty": 11.0, "not_a_column": 1},
+				item_price2.name: {"actual_qty": 22.0, "reserved_qty": 2.0},
+			},
+			chunk_size=1,
+		)
+
+		self.assertEqual(written, 2)
+		self.assertEqual(flt(frappe.db.get_value("Item Price", item_price1.name, "actual_qty")), 11.0)
+		self.assertEqual(flt(frappe.db.get_value("Item Price", item_price2.name, "actual_qty")), 22.0)
+		self.assertEqual(flt(frappe.db.get_value("Item Price", item_price2.name, "reserved_qty")), 2.0)
+
+	def test_refresh_skips_unchanged_rows(self):
+		"""Test that a second refresh with no stock movement writes nothing"""
+		self.create_test_bin(actual_qty=60.0, reserved_qty=5.0)
+		item_price = self.create_test_item_price()
+
+		first = refresh_item_price_rows(load_item_price_rows(names=[item_price.name]))
+		second = refresh_item_price_rows(load_item_price_rows(names=[item_price.name]))
+
+		self.assertEqual(first.written + first.skipped, 1)
+		self.assertEqual(second.written, 0)
+		self.assertEqual(second.skipped, 1)
+
+	def test_mark_item_prices_dirty_coalesces_pairs(self):
+		"""Test that repeated events for one pair share a dirty set entry and one drainer job"""
+		cache = frappe.cache()
+		cache.delete_key(_DIRTY_SET_KEY)
+
+		with patch("frappe.enqueue") as enqueue:
+			mark_item_prices_dirty([(self.test_item, self.test_warehouse)])
+			mark_item_prices_dirty(
+				[{"item_code": self.test_item, "warehouse": self.test_warehouse}, (self.test_item, None)]
+			)
+
+		pairs = {_decode_dirty_pair(member) for member in cache.smembers(_DIRTY_SET_KEY)}
+		self.assertEqual(pairs, {(self.test_item, self.test_warehouse), (self.test_item, None)})
+		for call in enqueue.call_args_list:
+			self.assertTrue(call.kwargs.get("deduplicate"))
+
+		cache.delete_key(_DIRTY_SET_KEY)
+
+	def test_iter_bin_change_batches_pages_from_cursor(self):
+		"""Test that Bin changes are paged forward from the cursor without repeats"""
+		bin_doc = self.create_test_bin(actual_qty=10.0)
+		modified = frappe.db.get_value("Bin", bin_doc.name, "modified")
+
+		seen = []
+		for rows in _iter_bin_change_batches((add_to_date(modified, seconds=-1), ""), batch_size=1, max_batches=100):
+			self.assertEqual(len(rows), 1)
+			seen.append(rows[0].name)
+
+		self.assertIn(bin_doc.name, seen)
+		self.assertEqual(len(seen), len(set(seen)))
+
+		after = list(_iter_bin_change_batches((modified, bin_doc.name), batch_size=10, max_batches=1))
+		self.assertNotIn(bin_doc.name, [row.name for rows in after for row in rows])
+
+	def test_iter_bin_change_batches_stops_at_commit_grace_bound(self):
+		"""Test that Bins modified at or after the grace bound are left for a later run"""
+		bin_doc = self.create_test_bin(actual_qty=10.0)
+		modified = frappe.db.get_value("Bin", bin_doc.name, "modified")
+		cursor = (add_to_date(modified, seconds=-1), "")
+
+		def scanned(until):
+			return [row.name for rows in _iter_bin_change_batches(cursor, max_batches=100, until=until) for row in rows]
+
+		self.assertNotIn(bin_doc.name, scanned(modified))
+		self.assertIn(bin_doc.name, scanned(add_to_date(modified, seconds=1)))
+
+	def test_stock_snapshot_cache_invalidation(self):
+		"""Test that cached snapshots are served until the item is invalidated"""
+		pair = (self.test_item, self.test_warehouse)
+		invalidate_stock_snapshot_cache([self.test_item])
+		self.assertEqual(_read_cached_snapshots([pair]), {})
+
+		snapshot = _get_stock_snapshots([pair], use_cache=True)[pair]
+		self.assertEqual(_read_cached_snapshots([pair]), {pair: snapshot})
+
+		invalidate_stock_snapshot_cache([self.test_item])
+		self.assertEqual(_read_cached_snapshots([pair]), {})
+
+	def test_default_warehouse_cache_cleared_on_item_update(self):
+		"""Test that bulk-resolved default warehouses are cached until the Item changes"""
+		resolved = _get_item_default_warehouses([self.test_item, "NON-EXISTENT-ITEM"])
+
+		self.assertIn(self.test_item, resolved)
+		self.assertIsNone(resolved["NON-EXISTENT-ITEM"])
+		self.assertIn(self.test_item, _read_cached_default_warehouses([self.test_item]))
+
+		clear_item_default_warehouse_cache(frappe._dict(name=self.test_item))
+		self.assertNotIn(self.test_item, _read_cached_default_warehouses([self.test_item]))
+
+	def test_ensure_indexes_is_idempotent(self):
+		"""Test that every app index is present and a second run creates nothing"""
+		ensure_indexes()
+		results = ensure_indexes()
+
+		self.assertEqual(len(results), len(APP_INDEXES))
+		for result in results:
+			self.assertIn(result["status"], ("exists", "covered"), result)
+
+	def test_enqueue_refresh_by_filters_collapses_duplicates(self):
+		"""Test that the same filters map to one job id and the worker records progress"""
+		filters = [["Item Price", "item_code", "=", self.test_item]]
+		with patch("apex_item.item_price_hooks.frappe.enqueue") as enqueue:
+			first = enqueue_refresh_item_prices_by_filters(filters)
+			second = enqueue_refresh_item_prices_by_filters(filters)
+
+		self.assertEqual(first["job_id"], second["job_id"])
+		self.assertEqual(enqueue.call_args.kwargs["job_id"], first["job_id"])
+
+		run_refresh_item_prices_job(first["job_id"], filters=filters)
+		status = get_refresh_job_status(first["job_id"])
+		self.assertEqual(status["status"], "finished")
+		self.assertEqual(status["processed"], status["total"])
+
+	def test_enqueue_refresh_joining_running_job_keeps_status(self):
+		"""Test that a request collapsed into a running job keeps its status and gets its progress"""
+		filters = [["Item Price", "item_code", "=", self.test_item]]
+		with patch("apex_item.item_price_hooks.frappe.enqueue") as enqueue:
+			job_id = enqueue_refresh_item_prices_by_filters(filters)["job_id"]
+		_set_refresh_job_status(job_id, status="running", total=10, processed=4)
+
+		with patch("apex_item.item_price_hooks.is_job_enqueued", return_value=True), patch(
+			"apex_item.item_price_hooks.frappe.enqueue"
+		) as enqueue, patch("apex_item.item_price_hooks.frappe.session", frappe._dict(user="Guest")):
+			status = enqueue_refresh_item_prices_by_filters(filters)
+
+		enqueue.assert_not_called()
+		self.assertEqual((status["status"], status["processed"]), ("running", 4))
+		self.assertEqual(status["users"], ["Administrator", "Guest"])
+
+		with patch("apex_item.item_price_hooks.frappe.publish_realtime") as publish:
+			_publish_refresh_job_status(status)
+		self.assertEqual({call.kwargs["user"] for call in publish.call_args_list}, {"Administrator", "Guest"})
+
+	def test_get_live_stock_snapshots_does_not_write(self):
+		"""Test that live snapshots reflect Bin values while the stored row stays untouched"""
+		item_price = self.create_test_item_price()
+		bin_doc = self.create_test_bin(actual_qty=40.0, reserved_qty=5.0)
+		frappe.db.set_value("Bin", bin_doc.name, "actual_qty", 60.0, update_modified=False)
+		invalidate_stock_snapshot_cache([self.test_item])
+		stored = frappe.db.get_value("Item Price", item_price.name, "actual_qty")
+
+		live = get_live_stock_snapshots([item_price.name])
+
+		self.assertEqual(flt(live[item_price.name]["actual_qty"]), 60.0)
+		self.assertEqual(flt(live[item_price.name]["available_qty"]), 55.0)
+		self.assertEqual(frappe.db.get_value("Item Price", item_price.name, "actual_qty"), stored)
+
+	def test_refresh_publishes_changed_fields_only(self):
+		"""Test that a refresh pushes only the stock fields that moved for written rows"""
+		item_price = self.create_test_item_price()
+		bin_doc = self.create_test_bin(actual_qty=30.0, reserved_qty=0.0)
+		refresh_item_price_rows(load_item_price_rows(names=[item_price.name]))
+		frappe.db.set_value("Bin", bin_doc.name, "actual_qty", 45.0, update_modified=False)
+		invalidate_stock_snapshot_cache([self.test_item])
+
+		with patch("apex_item.item_price_hooks.frappe.publish_realtime") as publish:
+			refresh_item_price_rows(load_item_price_rows(names=[item_price.name]))
+
+		rows = publish.call_args.args[1]["rows"]
+		self.assertEqual(publish.call_args.kwargs["doctype"], "Item Price")
+		self.assertEqual(set(rows[item_price.name]), {"actual_qty", "available_qty"})
+		self.assertEqual(rows[item_price.name]["actual_qty"], 45.0)
+
+	def test_refresh_stamps_sync_time_and_honours_max_staleness(self):
+		"""Test that written rows get a sync stamp and fresh rows are skipped under max_staleness"""
+		self.create_test_bin(actual_qty=12.0, reserved_qty=2.0)
+		item_price = self.create_test_item_price()
+		frappe.db.set_value(
+			"Item Price", item_price.name, {"actual_qty": 0, "stock_synced_at": None}, update_modified=False
+		)
+
+		refresh_item_price_rows(load_item_price_rows(names=[item_price.name]), source="manual")
+		synced_at, source = frappe.db.get_value(
+			"Item Price", item_price.name, ["stock_synced_at", "stock_sync_source"]
+		)
+		self.assertIsNotNone(synced_at)
+		self.assertEqual(source, "manual")
+
+		stats = refresh_item_price_rows(load_item_price_rows(names=[item_price.name]), max_staleness=3600)
+		self.assertEqual(stats.fresh, 1)
+		self.assertEqual(stats.written, 0)
+
+		report = get_stock_staleness_stats("50,99")
+		self.assertIn("p50", report["age_seconds"])
+		self.assertGreaterEqual(report["synced"], 1)
+
+	def test_item_price_save_computes_one_snapshot(self):
+		"""Test that before_save and on_update share one memoized snapshot per transaction"""
+		self.create_test_bin(actual_qty=18.0, reserved_qty=3.0)
+		_clear_snapshot_memo()
+
+		with patch(
+			"apex_item.item_price_hooks._get_stock_snapshot", wraps=_get_stock_snapshot
+		) as get_snapshot, patch("apex_item.item_price_hooks.publish_stock_diffs") as publish:
+			item_price = self.create_test_item_price()
+
+		self.assertEqual(get_snapshot.call_count, 1)
+		publish.assert_not_called()
+		self.assertEqual(flt(item_price.available_qty), 15.0)
+
+	def test_stock_voucher_schedules_one_refresh(self):
+		"""Test that ledger entries and Bin updates of one transaction flush as one refresh"""
+		_discard_pending_item_price_refresh()
+		other_warehouse = "Stores - _TC"
+		for _row in range(50):
+			update_item_prices_from_stock_ledger(
+				frappe._dict(item_code=self.test_item, warehouse=self.test_warehouse)
+			)
+			update_item_prices_from_stock_ledger(frappe._dict(item_code=self.test_item, warehouse=other_warehouse))
+		update_item_price_from_bin(frappe._dict(item_code=self.test_item, warehouse=self.test_warehouse))
+
+		with patch("apex_item.item_price_hooks._dispatch_item_price_refresh") as dispatch:
+			_flush_pending_item_price_refresh()
+			_flush_pending_item_price_refresh()
+
+		dispatch.assert_called_once()
+		self.assertEqual(
+			set(dispatch.call_args.args[0]),
+			{(self.test_item, self.test_warehouse), (self.test_item, other_warehouse)},
+		)
+
+	def test_pending_refresh_dropped_on_rollback(self):
+		"""Test that scheduled pairs are dispatched only after commit and never after rollback"""
+		_discard_pending_item_price_refresh()
+		_enqueue_item_price_refresh([(self.test_item, self.test_warehouse)])
+
+		with patch("apex_item.item_price_hooks._dispatch_item_price_refresh") as dispatch:
+			_discard_pending_item_price_refresh()
+			_flush_pending_item_price_refresh()
+
+		dispatch.assert_not_called()
+
+	def test_stock_delta_mode_applies_ledger_quantities(self):
+		"""Test that ledger deltas of one transaction are summed and applied to the stored row"""
+		self.create_test_bin(actual_qty=10.0, reserved_qty=4.0)
+		item_price = self.create_test_item_price()
+		before = frappe.db.get_value("Item Price", item_price.name, ["actual_qty", "available_qty"], as_dict=True)
+
+		with patch.dict(frappe.conf, {"apex_item_stock_delta_mode": 1}), patch(
+			"apex_item.item_price_hooks._enqueue_item_price_refresh"
+		) as enqueue:
+			for qty in (5.0, 3.0, -2.0):
+				update_item_prices_from_stock_ledger(
+					frappe._dict(item_code=self.test_item, warehouse=self.test_warehouse, actual_qty=qty),
+					"on_submit",
+				)
+			update_item_price_from_bin(frappe._dict(item_code=self.test_item, warehouse=self.test_warehouse))
+			_apply_pending_stock_deltas()
+
+		enqueue.assert_not_called()
+		after = frappe.db.get_value("Item Price", item_price.name, ["actual_qty", "available_qty"], as_dict=True)
+		self.assertEqual(flt(after.actual_qty), flt(before.actual_qty) + 6.0)
+		self.assertEqual(flt(after.available_qty), flt(before.available_qty) + 6.0)
+
+	def test_stock_delta_mode_refreshes_stock_reconciliation(self):
+		"""Test that a Stock Reconciliation entry is refreshed in full instead of recorded as a delta"""
+		pair = (self.test_item, self.test_warehouse)
+		with patch.dict(frappe.conf, {"apex_item_stock_delta_mode": 1}), patch(
+			"apex_item.item_price_hooks._enqueue_item_price_refresh"
+		) as enqueue:
+			update_item_prices_from_stock_ledger(
+				frappe._dict(
+					item_code=self.test_item,
+					warehouse=self.test_warehouse,
+					voucher_type="Stock Reconciliation",
+					actual_qty=0,
+					qty_after_transaction=25.0,
+				),
+				"on_submit",
+			)
+			update_item_price_from_bin(frappe._dict(item_code=self.test_item, warehouse=self.test_warehouse))
+
+		self.assertNotIn(pair, getattr(frappe.local, _PENDING_STOCK_DELTAS_ATTR, None) or {})
+		self.assertEqual([call.args[0] for call in enqueue.call_args_list], [[pair], [pair]])
+
+	def test_stock_delta_mode_refreshes_reservation_vouchers(self):
+		"""Test that deliveries and production entries are refreshed in full, since they move reservations"""
+		pair = (self.test_item, self.test_warehouse)
+		entries = [
+			frappe._dict(voucher_type="Delivery Note", voucher_no="DN-TEST", actual_qty=-2.0),
+			frappe._dict(voucher_type="Stock Entry", voucher_no="STE-TEST", actual_qty=-3.0),
+		]
+		with patch.dict(frappe.conf, {"apex_item_stock_delta_mode": 1}), patch(
+			"apex_item.item_price_hooks._enqueue_item_price_refresh"
+		) as enqueue, patch(
+			"apex_item.item_price_hooks.frappe.db.get_value",
+			return_value=frappe._dict(purpose="Manufacture", work_order="WO-TEST", subcontracting_order=None),
+		):
+			for entry in entries:
+				update_item_prices_from_stock_ledger(
+					frappe._dict(entry, item_code=self.test_item, warehouse=self.test_warehouse), "on_submit"
+				)
+
+		self.assertNotIn(pair, getattr(frappe.local, _PENDING_STOCK_DELTAS_ATTR, None) or {})
+		self.assertEqual([call.args[0] for call in enqueue.call_args_list], [[pair], [pair]])
+
+	def test_group_warehouse_snapshot_sums_descendants(self):
+		"""Test that a group stock_warehouse aggregates the Bins of its leaf warehouses"""
+		company = frappe.db.get_value("Warehouse", self.test_warehouse, "company")
+		group = frappe.get_doc(
+			{"doctype": "Warehouse", "warehouse_name": f"TEST-GRP-{frappe.generate_hash(length=6)}", "is_group": 1, "company": company}
+		).insert(ignore_permissions=True)
+		leaves = [
+			frappe.get_doc(
+				{
+					"doctype": "Warehouse",
+					"warehouse_name": f"TEST-LEAF-{frappe.generate_hash(length=6)}",
+					"parent_warehouse": group.name,
+					"company": company,
+				}
+			).insert(ignore_permissions=True)
+			for _leaf in range(2)
+		]
+		self.create_test_bin(warehouse=leaves[0].name, actual_qty=7.0, reserved_qty=1.0)
+		self.create_test_bin(warehouse=leaves[1].name, actual_qty=5.0)
+
+		snapshot = _get_stock_snapshots([(self.test_item, group.name)])[(self.test_item, group.name)]
+
+		self.assertEqual(flt(snapshot["actual_qty"]), 12.0)
+		self.assertEqual(flt(snapshot["available_qty"]), 11.0)
+
+	def test_refresh_skips_locked_items(self):
+		"""Test that rows of an item locked by another refresh are re-marked dirty instead of written"""
+		self.create_test_bin(actual_qty=4.0)
+		item_price = self.create_test_item_price()
+		locks = acquire_item_locks([self.test_item])
+		try:
+			with patch("apex_item.item_price_hooks.mark_item_prices_dirty") as mark_dirty:
+				stats = refresh_item_price_rows(load_item_price_rows(names=[item_price.name]), commit=False)
+		finally:
+			release_item_locks(locks)
+
+		self.assertEqual(stats.locked, 1)
+		self.assertEqual(stats.written, 0)
+		self.assertIn((self.test_item, self.test_warehouse), list(mark_dirty.call_args[0][0]))
+
+	def test_refresh_skips_failed_snapshots(self):
+		"""Test that rows whose snapshot query fails keep their values and are re-marked dirty"""
+		self.create_test_bin(actual_qty=9.0)
+		item_price = self.create_test_item_price()
+		stored = frappe.db.get_value("Item Price", item_price.name, ["actual_qty", "stock_synced_at"])
+
+		with patch(
+			"apex_item.item_price_hooks._fill_stock_snapshots", side_effect=Exception("snapshot failed")
+		), patch("apex_item.item_price_hooks.mark_item_prices_dirty") as mark_dirty, patch(
+			"apex_item.item_price_hooks.frappe.log_error"
+		):
+			stats = refresh_item_price_rows(load_item_price_rows(names=[item_price.name]))
+
+		self.assertEqual((stats.failed, stats.written), (1, 0))
+		self.assertEqual(frappe.db.get_value("Item Price", item_price.name, ["actual_qty", "stock_synced_at"]), stored)
+		self.assertIn((self.test_item, self.test_warehouse), list(mark_dirty.call_args[0][0]))
+
+	def test_drain_puts_batch_back_on_write_failure(self):
+		"""Test that a batch whose write fails goes back into the dirty set for the next drain"""
+		self.create_test_bin(actual_qty=3.0)
+		self.create_test_item_price()
+		cache = frappe.cache()
+		cache.delete_key(_DIRTY_SET_KEY)
+		self.addCleanup(cache.delete_key, _DIRTY_SET_KEY)
+		with patch("frappe.enqueue"):
+			mark_item_prices_dirty([(self.test_item, self.test_warehouse)])
+
+		with patch(
+			"apex_item.item_price_hooks.bulk_update_values", side_effect=Exception("write failed")
+		) as write, patch("apex_item.item_price_hooks.frappe.log_error"):
+			drain_item_price_refresh_queue(debounce=False)
+
+		write.assert_called_once()
+		pairs = {_decode_dirty_pair(member) for member in cache.smembers(_DIRTY_SET_KEY)}
+		self.assertEqual(pairs, {(self.test_item, self.test_warehouse)})
+
+	def test_stock_hooks_clear_cached_snapshot_before_commit(self):
+		"""Test that a stock hook drops the cached snapshot at once and form refreshes read the Bin"""
+		item_price = self.create_test_item_price()
+		bin_doc = self.create_test_bin(actual_qty=20.0, reserved_qty=5.0)
+		pair = (self.test_item, self.test_warehouse)
+		_get_stock_snapshots([pair], use_cache=True)
+		self.assertIn(pair, _read_cached_snapshots([pair]))
+
+		_discard_pending_item_price_refresh()
+		update_item_price_from_bin(frappe._dict(item_code=self.test_item, warehouse=self.test_warehouse))
+		_discard_pending_item_price_refresh()
+		self.assertEqual(_read_cached_snapshots([pair]), {})
+
+		# A snapshot cached behind the hooks' back is not used by the write paths
+		_get_stock_snapshots([pair], use_cache=True)
+		frappe.db.set_value("Bin", bin_doc.name, "actual_qty", 35.0, update_modified=False)
+		result = refresh_item_price(item_price.name)
+		self.assertEqual(flt(result["actual_qty"]), 35.0)
+		self.assertEqual(flt(frappe.db.get_value("Item Price", item_price.name, "available_qty")), 30.0)
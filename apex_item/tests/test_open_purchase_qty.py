@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2025, Apex Item
+# License: MIT. See LICENSE
+
+"""Tests for the materialized open Purchase Order quantity table"""
+
+from __future__ import annotations
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+from frappe.utils import flt
+
+from apex_item.open_purchase_qty import OPEN_PURCHASE_QTY_TABLE, ensure_open_purchase_qty_table
+from apex_item.tests.utils import (
+	cancel_doc,
+	get_test_warehouse,
+	make_purchase_order,
+	make_purchase_receipt,
+	make_test_item,
+)
+
+
+class TestOpenPurchaseQty(FrappeTestCase):
+	"""Test cases for open quantity maintenance on purchase document events"""
+
+	def setUp(self):
+		frappe.db.rollback()
+		frappe.db.begin()
+		frappe.set_user("Administrator")
+		ensure_open_purchase_qty_table()
+
+	def tearDown(self):
+		frappe.db.rollback()
+
+	def get_open_qty(self, item_code, warehouse):
+		rows = frappe.db.sql(
+			f"SELECT open_qty FROM `{OPEN_PURCHASE_QTY_TABLE}` WHERE item_code = %s AND warehouse = %s",
+			(item_code, warehouse),
+		)
+		return flt(rows[0][0]) if rows else 0.0
+
+	def test_open_qty_follows_purchase_order_and_receipt(self):
+		"""Test that submitting a PO and a partial PR, then cancelling the PR, keeps open_qty current"""
+		item_code = make_test_item()
+		warehouse = get_test_warehouse()
+
+		po = make_purchase_order(item_code, warehouse, qty=10)
+		self.assertEqual(self.get_open_qty(item_code, warehouse), 10.0)
+
+		pr = make_purchase_receipt(item_code, warehouse, qty=4, purchase_order=po.name)
+		self.assertEqual(self.get_open_qty(item_code, warehouse), 6.0)
+
+		cancel_doc(pr)
+		self.assertEqual(self.get_open_qty(item_code, warehouse), 10.0)
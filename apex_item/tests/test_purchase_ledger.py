@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2025, Apex Item
+# License: MIT. See LICENSE
+
+"""Tests for the materialized item purchase ledger"""
+
+from __future__ import annotations
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+from frappe.utils import flt
+
+from apex_item.purchase_ledger import (
+	PURCHASE_LEDGER_TABLE,
+	ensure_purchase_ledger_table,
+	get_purchase_ledger_rows,
+	update_purchase_ledger,
+)
+from apex_item.tests.utils import (
+	cancel_doc,
+	get_test_warehouse,
+	make_landed_cost_voucher,
+	make_purchase_order,
+	make_purchase_receipt,
+	make_test_item,
+)
+
+
+class TestPurchaseLedger(FrappeTestCase):
+	"""Test cases for ledger maintenance on purchase document and LCV events"""
+
+	def setUp(self):
+		frappe.db.rollback()
+		frappe.db.begin()
+		frappe.set_user("Administrator")
+		ensure_purchase_ledger_table()
+
+	def tearDown(self):
+		frappe.db.rollback()
+
+	def get_ledger_row(self, doc, item_code):
+		rows = frappe.db.sql(
+			f"""
+			SELECT * FROM `{PURCHASE_LEDGER_TABLE}`
+			WHERE voucher_type = %s AND voucher_no = %s AND item_code = %s
+			""",
+			(doc.doctype, doc.name, item_code),
+			as_dict=True,
+		)
+		return rows[0] if rows else None
+
+	def test_ledger_follows_submit_cancel_and_lcv(self):
+		"""Test that ledger rows track document submit and cancel and the charges of LCVs"""
+		item_code = make_test_item()
+		warehouse = get_test_warehouse()
+
+		po = make_purchase_order(item_code, warehouse, qty=5, rate=80)
+		pr = make_purchase_receipt(item_code, warehouse, qty=5, rate=100)
+		self.assertEqual(self.get_ledger_row(po, item_code).priority, 3)
+		self.assertIsNone(self.get_ledger_row(pr, item_code).lcv_name)
+
+		lcv = make_landed_cost_voucher([pr], charges=50)
+		row = self.get_ledger_row(pr, item_code)
+		self.assertEqual(row.lcv_name, lcv.name)
+		self.assertEqual(flt(row.lcv_charges), 50.0)
+		self.assertIn(lcv.name, [row.lcv_name for row in get_purchase_ledger_rows(item_code)])
+
+		cancel_doc(lcv)
+		self.assertIsNone(self.get_ledger_row(pr, item_code).lcv_name)
+
+		cancel_doc(pr)
+		self.assertIsNone(self.get_ledger_row(pr, item_code))
+
+		# A direct recompute of a submitted document restores a dropped row
+		frappe.db.sql(f"DELETE FROM `{PURCHASE_LEDGER_TABLE}` WHERE voucher_no = %s", po.name)
+		update_purchase_ledger("Purchase Order", [po.name])
+		self.assertEqual(flt(self.get_ledger_row(po, item_code).base_net_rate), 80.0)
@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2025, Apex Item
+# License: MIT. See LICENSE
+
+"""Purchase document builders shared by the Apex Item tests"""
+
+from __future__ import annotations
+
+from unittest.mock import patch
+
+import frappe
+from frappe.utils import nowdate
+
+
+def make_test_item(prefix="TEST-PUR"):
+	"""Create a fresh stock item so purchase history from other tests does not leak in"""
+	item = frappe.new_doc("Item")
+	item.item_code = f"{prefix}-{frappe.generate_hash(length=8)}"
+	item.item_name = item.item_code
+	item.item_group = frappe.db.get_value("Item Group", {"is_group": 0}, "name") or frappe.db.get_value("Item Group", {}, "name")
+	item.stock_uom = "Nos"
+	item.is_stock_item = 1
+	item.flags.ignore_mandatory = True
+	item.insert(ignore_permissions=True)
+	return item.name
+
+
+def get_test_warehouse(company=None):
+	company = company or get_test_company()
+	return frappe.db.get_value("Warehouse", {"company": company, "is_group": 0}, "name")
+
+
+def get_test_company():
+	return frappe.db.get_value("Company", {}, "name") or frappe.db.get_single_value("Global Defaults", "default_company")
+
+
+def get_test_supplier():
+	supplier = frappe.db.get_value("Supplier", {"supplier_name": "Apex Item Test Supplier"}, "name")
+	if supplier:
+		return supplier
+
+	return (
+		frappe.get_doc(
+			{
+				"doctype": "Supplier",
+				"supplier_name": "Apex Item Test Supplier",
+				"supplier_group": frappe.db.get_value("Supplier Group", {"is_group": 0}, "name"),
+			}
+		)
+		.insert(ignore_permissions=True)
+		.name
+	)
+
+
+def make_purchase_order(item_code, warehouse, qty=10, rate=100, submit=True):
+	doc = frappe.get_doc(
+		{
+			"doctype": "Purchase Order",
+			"supplier": get_test_supplier(),
+			"company": frappe.db.get_value("Warehouse", warehouse, "company"),
+			"transaction_date": nowdate(),
+			"schedule_date": nowdate(),
+			"items": [
+				{"item_code": item_code, "qty": qty, "rate": rate, "warehouse": warehouse, "schedule_date": nowdate()}
+			],
+		}
+	)
+	return _save(doc, submit)
+
+
+def make_purchase_receipt(item_code, warehouse, qty=10, rate=100, purchase_order=None, submit=True):
+	if purchase_order:
+		from erpnext.buying.doctype.purchase_order.purchase_order import make_purchase_receipt as map_receipt
+
+		doc = map_receipt(purchase_order)
+		doc.items[0].qty = qty
+	else:
+		doc = frappe.get_doc(
+			{
+				"doctype": "Purchase Receipt",
+				"supplier": get_test_supplier(),
+				"company": frappe.db.get_value("Warehouse", warehouse, "company"),
+				"posting_date": nowdate(),
+				"items": [{"item_code": item_code, "qty": qty, "rate": rate, "warehouse": warehouse}],
+			}
+		)
+	return _save(doc, submit)
+
+
+def make_purchase_invoice(item_code, warehouse, qty=10, rate=100, update_stock=0, submit=True):
+	doc = frappe.get_doc(
+		{
+			"doctype": "Purchase Invoice",
+			"supplier": get_test_supplier(),
+			"company": frappe.db.get_value("Warehouse", warehouse, "company"),
+			"posting_date": nowdate(),
+			"update_stock": update_stock,
+			"items": [{"item_code": item_code, "qty": qty, "rate": rate, "warehouse": warehouse}],
+		}
+	)
+	return _save(doc, submit)
+
+
+def make_landed_cost_voucher(receipts, charges=50):
+	"""Submit an LCV distributing `charges` by quantity over the given submitted receipts"""
+	company = receipts[0].company
+	doc = frappe.new_doc("Landed Cost Voucher")
+	doc.company = company
+	doc.distribute_charges_based_on = "Qty"
+	for receipt in receipts:
+		doc.append(
+			"purchase_receipts",
+			{
+				"receipt_document_type": receipt.doctype,
+				"receipt_document": receipt.name,
+				"supplier": receipt.supplier,
+				"posting_date": receipt.posting_date,
+				"grand_total": receipt.grand_total,
+			},
+		)
+	doc.get_items_from_purchase_receipts()
+	doc.append(
+		"taxes",
+		{
+			"description": "Freight",
+			"expense_account": frappe.get_cached_value("Company", company, "expenses_included_in_valuation"),
+			"amount": charges,
+		},
+	)
+	return _save(doc, True)
+
+
+def cancel_doc(doc):
+	with patch.object(frappe.db, "commit"):
+		doc.cancel()
+	return doc
+
+
+def _save(doc, submit):
+	# The purchase hooks commit; keep everything inside the test transaction
+	with patch.object(frappe.db, "commit"):
+		doc.insert(ignore_permissions=True)
+		if submit:
+			doc.submit()
+	return doc
@@ -1,6 +1,11 @@
 
 import frappe
-from apex_item.item_foreign_purchase_hooks import update_item_on_save
+from apex_item.bulk_write import bulk_update_values, get_bulk_write_chunk_size
+from apex_item.item_foreign_purchase import (
+    calculate_sales_price_recommended,
+    get_foreign_purchase_item_values,
+    get_items_foreign_purchase_info,
+)
 
 @frappe.whitelist()
 def trigger_update_foreign_purchase_info():
@@ -18,32 +23,47 @@ def trigger_update_foreign_purchase_info():
 def _update_items_foreign_purchase_info_job():
     """
     Worker function to update items.
+    Computes the purchase info of every item in one pass and writes the Item
+    fields (and Sales Price Recommended) with chunked bulk UPDATEs.
     """
     try:
-        items = frappe.get_all("Item", filters={"is_stock_item": 1, "disabled": 0}, fields=["name"])
+        items = frappe.get_all(
+            "Item",
+            filters={"is_stock_item": 1, "disabled": 0},
+            fields=["name", "expense_calculation_method", "expense_percentage", "margin_profit_percent"],
+        )
         total = len(items)
         print(f"Apex Item: Starting background update for {total} items...")
-        
-        count = 0
+
+        purchase_infos = get_items_foreign_purchase_info()
+        payloads = {}
         for item in items:
+            values = get_foreign_purchase_item_values(purchase_infos.get(item.name))
+            # Same calculation the Item validate hook runs on save
+            doc = frappe._dict(item, **values)
+            calculate_sales_price_recommended(doc)
+            if "sales_price_recommended" in doc:
+                values["sales_price_recommended"] = doc.sales_price_recommended
+            payloads[item.name] = values
+
+        count = 0
+        chunk_size = get_bulk_write_chunk_size()
+        names = sorted(payloads)
+        for start in range(0, len(names), chunk_size):
+            chunk = names[start : start + chunk_size]
             try:
-                doc = frappe.get_doc("Item", item.name)
-                # Pass 'validate' as method to simulate save event
-                update_item_on_save(doc, "validate")
-                doc.save(ignore_permissions=True)
-                count += 1
-                
-                # Commit every 100 items to avoid large transaction logs
-                if count % 100 == 0:
-                    frappe.db.commit()
-                    
+                # Commit every chunk to avoid large transaction logs
+                count += bulk_update_values("Item", {name: payloads[name] for name in chunk}, commit=True)
             except Exception as e:
-                print(f"Apex Item: Failed to update {item.name}: {e}")
+                frappe.db.rollback()
+                print(f"Apex Item: Failed to update {len(chunk)} items from {chunk[0]}: {e}")
                 # Log error but continue
-                frappe.log_error(f"Apex Item: Failed to update {item.name}: {e}", "Apex Item Background Update")
-        
-        frappe.db.commit()
+                frappe.log_error(
+                    f"Apex Item: Failed to update {len(chunk)} items from {chunk[0]}: {e}",
+                    "Apex Item Background Update",
+                )
+
         print(f"Apex Item: Background update completed. Updated {count}/{total} items.")
-        
+
     except Exception as e:
         frappe.log_error(f"Apex Item: Job failed: {e}", "Apex Item Background Update Fatal Error")
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""
+Cached Warehouse tree lookups for stock snapshots of group warehouses.
+
+An Item Price whose stock_warehouse is a group warehouse shows the stock of
+every leaf warehouse below it. Descendant and ancestor sets are resolved from
+the nested-set lft/rgt bounds once and kept in site-scoped Redis hashes until
+a Warehouse changes.
+"""
+
+from __future__ import annotations
+
+import json
+
+import frappe
+
+_DESCENDANTS_CACHE_KEY = "apex_item:warehouse_descendants"
+_ANCESTORS_CACHE_KEY = "apex_item:warehouse_ancestors"
+_CACHE_TTL = 24 * 60 * 60
+
+
+def get_warehouse_descendants(warehouses) -> dict[str, tuple]:
+	"""
+	Return {warehouse: leaf warehouses it covers}. A leaf covers itself; a group
+	covers every non-group warehouse inside its lft/rgt range.
+	"""
+	return _get_warehouse_sets(
+		warehouses,
+		_DESCENDANTS_CACHE_KEY,
+		"""
+		SELECT name FROM `tabWarehouse`
+		WHERE lft >= %(lft)s AND rgt <= %(rgt)s AND is_group = 0
+		""",
+	)
+
+
+def get_warehouse_ancestors(warehouses) -> dict[str, tuple]:
+	"""Return {warehouse: the warehouse and every group warehouse above it}."""
+	return _get_warehouse_sets(
+		warehouses,
+		_ANCESTORS_CACHE_KEY,
+		"""
+		SELECT name FROM `tabWarehouse`
+		WHERE lft <= %(lft)s AND rgt >= %(rgt)s
+		""",
+	)
+
+
+def clear_warehouse_tree_cache(doc=None, method=None):
+	"""Doc event helper: any Warehouse change can move lft/rgt bounds, so drop both caches."""
+	try:
+		cache = frappe.cache()
+		cache.pipeline().delete(
+			cache.make_key(_DESCENDANTS_CACHE_KEY), cache.make_key(_ANCESTORS_CACHE_KEY)
+		).execute()
+	except Exception:
+		frappe.log_error(frappe.get_traceback(), "Apex Item: Clear Warehouse Tree Cache")
+
+
+def _get_warehouse_sets(warehouses, cache_key, range_query) -> dict[str, tuple]:
+	warehouses = list(dict.fromkeys(warehouse for warehouse in warehouses or [] if warehouse))
+	if not warehouses:
+		return {}
+
+	resolved = _read_cached_sets(cache_key, warehouses)
+	missing = [warehouse for warehouse in warehouses if warehouse not in resolved]
+	if not missing:
+		return resolved
+
+	computed = {}
+	for row in frappe.db.get_all(
+		"Warehouse", filters={"name": ("in", missing)}, fields=["name", "lft", "rgt", "is_group"]
+	):
+		if row.is_group or cache_key == _ANCESTORS_CACHE_KEY:
+			computed[row.name] = tuple(frappe.db.sql_list(range_query, {"lft": row.lft, "rgt": row.rgt}))
+		else:
+			computed[row.name] = (row.name,)
+
+	_write_cached_sets(cache_key, computed)
+	resolved.update(computed)
+	# Unknown warehouses cover only themselves and are not cached
+	for warehouse in missing:
+		resolved.setdefault(warehouse, (warehouse,))
+	return resolved
+
+
+def _read_cached_sets(cache_key, warehouses) -> dict[str, tuple]:
+	try:
+		cache = frappe.cache()
+		values = cache.pipeline().hmget(cache.make_key(cache_key), warehouses).execute()[0]
+	except Exception:
+		return {}
+
+	return {warehouse: tuple(json.loads(value)) for warehouse, value in zip(warehouses, values, strict=True) if value}
+
+
+def _write_cached_sets(cache_key, sets) -> None:
+	if not sets:
+		return
+	try:
+		cache = frappe.cache()
+		key = cache.make_key(cache_key)
+		pipe = cache.pipeline()
+		pipe.hset(key, mapping={warehouse: json.dumps(list(names)) for warehouse, names in sets.items()})
+		pipe.expire(key, _CACHE_TTL)
+		pipe.execute()
+	except Exception:
+		pass